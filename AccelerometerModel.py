@@ -0,0 +1,144 @@
+import numpy as np
+import TelemetryScheduler
+
+'''
+Vectorized accelerometer model.  The four accelerometers report an elevation
+and an azimuth voltage each, 8 channels ordered as the arguments of
+CellSimulator.setAccelerometerVoltage.  The mapping from the mirror's angular
+acceleration (ax, ay, az) to the channels is linear, a (3, 8) matrix built
+from the Accelerometer*Distance constants in which every channel follows a
+single axis.  Whole time series convert at once, each channel as its axis
+times its factor and then divided by the volts conversion, the same
+operations CellSimulator.setAngularAcceleration always did, so the voltages
+are bit for bit those of the scalar path and the azimuth channels 2 and 4
+are always +0.0:
+
+    model = AccelerometerModel.fromCellSimulator(CellSimulator)
+    volts = model.angularToVolts(angular)       # (N, 3) rad/s^2 -> (N, 8) V
+    frames = model.encodeFrames(volts)          # (N, 40) the 4 responses of every row
+
+A row of encodeFrames is the four AccelSimulator.accelerometerResponse frames
+back to back, byte for byte, ready to go out as one datagram.
+'''
+
+CHANNELS = 8
+ACCELEROMETERS = 4
+# AccelSimulator.accelerometerResponse, [length, accelerometer number, elevation voltage, azimuth voltage]
+FRAME_DTYPE = np.dtype([('length', 'u1'), ('number', 'i1'), ('elevation', '>f4'), ('azimuth', '>f4')])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+##########################################################################################################
+# (3, 8) matrix taking (ax, ay, az) to the 8 channel accelerations (m/s^2), as CellSimulator.setAngularAcceleration
+def geometryMatrix(xDistance:float, yDistance:float, zDistance:float):
+    matrix = np.zeros((3, CHANNELS))
+    matrix[0, 7] = xDistance / 2.0
+    matrix[0, 5] = -xDistance / 2.0
+    matrix[1, 2] = yDistance / 2.0
+    matrix[1, 0] = -yDistance / 2.0
+    matrix[2, 4] = -zDistance
+    matrix[2, 6] = -zDistance
+    return matrix
+
+class AccelerometerModel:
+
+    def __init__(self, voltsToMetersPerSecondSqrd:float, xDistance:float, yDistance:float, zDistance:float):
+        self.voltsToMetersPerSecondSqrd = voltsToMetersPerSecondSqrd
+        self.xDistance = xDistance
+        self.yDistance = yDistance
+        self.zDistance = zDistance
+        self.geometry = geometryMatrix(xDistance, yDistance, zDistance)
+        # (axis, factor) of every channel, None for the channels that are always 0
+        self._channels = [None] * CHANNELS
+        for axis, channel in zip(*np.nonzero(self.geometry)):
+            self._channels[channel] = (int(axis), float(self.geometry[axis, channel]))
+        self._used = np.array([channel for channel in range(CHANNELS) if self._channels[channel] is not None])
+        self._axes = np.array([self._channels[channel][0] for channel in self._used])
+        self._factors = np.array([self._channels[channel][1] for channel in self._used])
+
+    # The model of a CellSimulator (class or instance), from its Accelerometer* constants
+    @classmethod
+    def fromCellSimulator(cls, sim):
+        return cls(sim.AccelerometerVoltsToMetersPerSecondSqrd, sim.AccelerometerXDistance,
+                   sim.AccelerometerYDistance, sim.AccelerometerZDistance)
+
+    # True when the model was built from these constants
+    def matches(self, voltsToMetersPerSecondSqrd:float, xDistance:float, yDistance:float, zDistance:float):
+        return (self.voltsToMetersPerSecondSqrd == voltsToMetersPerSecondSqrd and self.xDistance == xDistance
+                and self.yDistance == yDistance and self.zDistance == zDistance)
+
+    ##########################################################################################################
+    # (N, 3) angular accelerations to (N, 8) channel accelerations (m/s^2)
+    def angularToAcceleration(self, angular):
+        angular = np.asarray(angular, dtype=np.float64)
+        accelerations = np.zeros(angular.shape[:-1] + (CHANNELS,))
+        accelerations[..., self._used] = angular[..., self._axes] * self._factors
+        return accelerations
+
+    # (N, 3) angular accelerations to (N, 8) channel voltages
+    def angularToVolts(self, angular):
+        return self.accelerationToVolts(self.angularToAcceleration(angular))
+
+    # (N, 8) channel accelerations (m/s^2) to voltages
+    def accelerationToVolts(self, accelerations):
+        return np.asarray(accelerations, dtype=np.float64) / self.voltsToMetersPerSecondSqrd
+
+    # The 8 voltages of one angular acceleration, as Python floats
+    def angularToVoltsRow(self, ax:float, ay:float, az:float):
+        angular = (ax, ay, az)
+        volts = self.voltsToMetersPerSecondSqrd
+        return [angular[channel[0]] * channel[1] / volts if channel is not None else 0.0 for channel in self._channels]
+
+    ##########################################################################################################
+    # (N, 8) voltages to an (N, 4 * FRAME_SIZE) uint8 array, every row the 4 accelerometer responses
+    def encodeFrames(self, volts):
+        volts = np.asarray(volts, dtype=np.float64).reshape(-1, CHANNELS)
+        frames = np.empty((len(volts), ACCELEROMETERS), dtype=FRAME_DTYPE)
+        frames['length'] = FRAME_SIZE - 1
+        frames['number'] = np.arange(1, ACCELEROMETERS + 1)
+        frames['elevation'] = volts[:, 0::2]
+        frames['azimuth'] = volts[:, 1::2]
+        return frames.view(np.uint8).reshape(len(volts), ACCELEROMETERS * FRAME_SIZE)
+#end class AccelerometerModel
+
+##########################################################################################################
+# Add a stream sending row after row of angular (N, 3) rad/s^2 to sim's accelerometers at rate Hz, one
+# datagram per row.  Everything is encoded before the run, a producer call is a slice and a send.
+def streamAngularAcceleration(scheduler:TelemetryScheduler.TelemetryScheduler, name:str, rate:float, angular, sim,
+                              loop:bool = False, overrunPolicy:str = TelemetryScheduler.SKIP):
+    model = AccelerometerModel.fromCellSimulator(sim)
+    frames = model.encodeFrames(model.angularToVolts(angular))
+    count, size = frames.shape
+    datagrams = frames.tobytes()
+    send = sim.setAccelerometerFrames
+
+    def produce(tick:int):
+        if tick >= count:
+            if not loop:
+                return
+            tick %= count
+        send(datagrams[tick * size:(tick + 1) * size])
+
+    return scheduler.addStream(name, rate, produce, overrunPolicy)
+
+###############################################################################
+# main - for testing
+def main():
+    import struct
+    import AccelSimulator
+    from CellSimulator import CellSimulator
+    model = AccelerometerModel.fromCellSimulator(CellSimulator)
+    volts = model.angularToVolts([[0.5, -1.25, 2.0], [0.0, 0.0, 0.0]])
+    assert(np.allclose(volts[0], np.array([0.625, 0.0, -0.625, 0.0, -2.0, -0.25, -2.0, 0.25]) / 4.9035))
+    assert(model.angularToVoltsRow(0.5, -1.25, 2.0) == list(volts[0]))
+    # the always zero channels stay +0.0 on both paths, as the scalar setAngularAcceleration sent them
+    for row in (model.angularToVoltsRow(-0.5, -1.25, -2.0), model.angularToVolts([-0.5, -1.25, -2.0])):
+        assert(struct.pack('>ff', row[1], row[3]) == bytes(8))
+    frames = model.encodeFrames(volts)
+    accelSim = AccelSimulator.AccelSimulator()
+    expected = b''.join(accelSim.accelerometerResponse(i + 1, float(volts[0][2 * i]), float(volts[0][2 * i + 1])) for i in range(4))
+    assert(frames[0].tobytes() == expected)
+    assert(struct.unpack('>Bbff', frames[1].tobytes()[30:40]) == (9, 4, 0.0, 0.0))
+    print("AccelerometerModel: OK")
+
+###############################################################################
+#main()
@@ -0,0 +1,98 @@
+import numpy as np
+from ForceActuatorTable import *
+from HardpointActuatorTable import *
+from HardpointMonitorTable import *
+
+'''
+Columnar (NumPy structured array) views of the force actuator, hardpoint
+actuator and hardpoint monitor tables, with precomputed masks and index arrays
+for vectorized work across the actuators.  The original list of lists tables
+stay the source of truth and are available as .table; a record row i is the
+same actuator as .table[i].
+'''
+
+FORCE_ACTUATOR_DTYPE = np.dtype([('index', 'i4'), ('id', 'i4'), ('x', 'f8'), ('y', 'f8'), ('z', 'f8'),
+                                 ('type', 'U3'), ('subnet', 'u1'), ('address', 'u1'), ('orientation', 'U2')])
+
+HARDPOINT_ACTUATOR_DTYPE = np.dtype([('index', 'i4'), ('id', 'i4'), ('x', 'f8'), ('y', 'f8'), ('z', 'f8'),
+                                     ('subnet', 'u1'), ('address', 'u1')])
+
+HARDPOINT_MONITOR_DTYPE = np.dtype([('index', 'i4'), ('id', 'i4'), ('subnet', 'u1'), ('address', 'u1')])
+
+SUBNETS = (1, 2, 3, 4, 5)
+
+class ActuatorColumns:
+
+    def __init__(self, table, dtype, columnIndices):
+        self.table = table
+        self.records = np.array([tuple(row[i] for i in columnIndices) for row in table], dtype=dtype)
+        self.ids = self.records['id']
+        self.subnets = self.records['subnet']
+        self.addresses = self.records['address']
+        self._rowById = np.full(int(self.ids.max()) + 1, -1, dtype=np.int32)
+        self._rowById[self.ids] = np.arange(len(self.ids), dtype=np.int32)
+        self.subnetMasks = {subnet : self.subnets == subnet for subnet in SUBNETS}
+        self.subnetIndices = {subnet : np.flatnonzero(mask) for subnet, mask in self.subnetMasks.items()}
+
+    def __len__(self):
+        return len(self.records)
+
+    ##########################################################################################################
+    # Convert ILC ids to rows, raises for ids that are not in the table
+    def rowsForIds(self, ids):
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if len(ids) == 0:
+            return ids.astype(np.int32)
+        if ids.min() < 0 or ids.max() >= len(self._rowById):
+            raise Exception("Actuator ids must be in the range [%d, %d]" % (self.ids.min(), self.ids.max()))
+        rows = self._rowById[ids]
+        if (rows < 0).any():
+            raise Exception("Unknown actuator ids: " + str(ids[rows < 0].tolist()))
+        return rows
+
+    def rowForId(self, id:int):
+        if id < 0 or id >= len(self._rowById) or self._rowById[id] < 0:
+            raise Exception("Unknown actuator id: " + str(id))
+        return int(self._rowById[id])
+
+class ForceActuatorColumns(ActuatorColumns):
+
+    def __init__(self, table = forceActuatorTable):
+        ActuatorColumns.__init__(self, table, FORCE_ACTUATOR_DTYPE,
+                                 (forceActuatorTableIndexIndex, forceActuatorTableIDIndex, forceActuatorTableXPositionIndex,
+                                  forceActuatorTableYPositionIndex, forceActuatorTableZPositionIndex, forceActuatorTableTypeIndex,
+                                  forceActuatorTableSubnetIndex, forceActuatorTableAddressIndex, forceActuatorTableOrientationIndex))
+        self.x = self.records['x']
+        self.y = self.records['y']
+        self.z = self.records['z']
+        self.types = self.records['type']
+        self.orientations = self.records['orientation']
+        self.saaMask = self.types == 'SAA'
+        self.daaMask = self.types == 'DAA'
+        self.saaIndices = np.flatnonzero(self.saaMask)
+        self.daaIndices = np.flatnonzero(self.daaMask)
+        # Secondary cylinder direction of the DAA ('+Y', '-Y', '+X', '-X'), SAA are 'NA'
+        self.orientationMasks = {str(orientation) : self.orientations == orientation for orientation in np.unique(self.orientations)}
+        self.orientationIndices = {orientation : np.flatnonzero(mask) for orientation, mask in self.orientationMasks.items()}
+
+class HardpointActuatorColumns(ActuatorColumns):
+
+    def __init__(self, table = hardpointActuatorTable):
+        ActuatorColumns.__init__(self, table, HARDPOINT_ACTUATOR_DTYPE,
+                                 (hardpointActuatorTableIndexIndex, hardpointActuatorTableIDIndex, hardpointActuatorTableXPositionIndex,
+                                  hardpointActuatorTableYPositionIndex, hardpointActuatorTableZPositionIndex,
+                                  hardpointActuatorTableSubnetIndex, hardpointActuatorTableAddressIndex))
+        self.x = self.records['x']
+        self.y = self.records['y']
+        self.z = self.records['z']
+
+class HardpointMonitorColumns(ActuatorColumns):
+
+    def __init__(self, table = hardpointMonitorTable):
+        ActuatorColumns.__init__(self, table, HARDPOINT_MONITOR_DTYPE,
+                                 (hardpointMonitorTableIndexIndex, hardpointMonitorTableIDIndex,
+                                  hardpointMonitorTableSubnetIndex, hardpointMonitorTableAddressIndex))
+
+forceActuators = ForceActuatorColumns()
+hardpointActuators = HardpointActuatorColumns()
+hardpointMonitors = HardpointMonitorColumns()
@@ -0,0 +1,131 @@
+import asyncio
+import socket
+import time
+import AsyncUDP
+import DOListener
+from CellSimulator import CellSimulator
+
+'''
+asyncio version of CellSimulator.  The subnet A-E, inclinometer, displacement,
+accelerometer, DI and DO clients and the DO response listener are asyncio
+datagram endpoints, so every set* call is a non blocking send and the get*
+DO requests return awaitables:
+
+    sim = await AsyncCellSimulator.create("127.0.0.1")
+    sim.setInclinometer(12.0)
+    valveOpen = await sim.getAirSupplyValve()
+
+Several simulators and sensor streams can run concurrently in one event loop.
+Give each simulator its own responsePort when running more than one.
+
+DO responses are decoded as they arrive and kept by port (DOListener.DOState),
+a request waits for the next response of its own port, so a late response to
+an earlier request can not be taken for the answer to a later one.
+'''
+
+class AsyncCellSimulator(CellSimulator):
+
+    def __init__(self, ipAddress, dbg = False, responseAddress = None, responsePort = None):
+        self.Print = dbg
+        self._ipAddress = ipAddress
+        self._responseAddress = responseAddress
+        self._responsePort = responsePort if responsePort is not None else self.ResponsePort
+        # When set, the get* DO methods return the cached value if it is younger than this many seconds
+        self.doCacheMaxAge = None
+        self._doStates = {}
+        self._doWaiters = []
+        self._createSimulators()
+
+    @classmethod
+    async def create(cls, ipAddress, dbg = False, responseAddress = None, responsePort = None):
+        sim = cls(ipAddress, dbg, responseAddress, responsePort)
+        await sim.open()
+        return sim
+
+    async def open(self):
+        ipAddress = self._ipAddress
+        (self._udpClientSubnetA, self._udpClientSubnetB, self._udpClientSubnetC, self._udpClientSubnetD,
+         self._udpClientSubnetE, self._udpClientInclin, self._udpClientDisplace, self._udpClientAccel,
+         self._udpClientDI, self._udpClientDO) = await asyncio.gather(
+            AsyncUDP.AsyncUDP.open(ipAddress, self.SubnetAPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.SubnetBPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.SubnetCPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.SubnetDPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.SubnetEPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.InclinometerPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.DisplacementPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.AccelerometerPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.DigitalInputPort),
+            AsyncUDP.AsyncUDP.open(ipAddress, self.DigitalOutputPort))
+        responseAddress = self._responseAddress
+        if responseAddress is None:
+            responseAddress = socket.gethostbyname(socket.gethostname())
+        self._udpResponse = await AsyncUDP.AsyncUDP.bind(responseAddress, self._responsePort)
+        self._udpResponse.handler = self._handleResponse
+        self._createRoutes()
+
+    def close(self):
+        for client in (self._udpClientSubnetA, self._udpClientSubnetB, self._udpClientSubnetC, self._udpClientSubnetD,
+                       self._udpClientSubnetE, self._udpClientInclin, self._udpClientDisplace, self._udpClientAccel,
+                       self._udpClientDI, self._udpClientDO, self._udpResponse):
+            client.close()
+
+    ##########################################################################################################
+    # The get* methods return requestDO(), here a coroutine the caller awaits
+    async def requestDO(self, request, timeout:float = 1.0):
+        port = request[1]
+        if self.doCacheMaxAge is not None:
+            state = self._doStates.get(port)
+            if state is not None and time.monotonic() - state.timestamp <= self.doCacheMaxAge:
+                return state.value
+        count = self._doStates[port].count if port in self._doStates else 0
+        self._udpClientDO.send(request)
+        return await self.getDO(port, count, timeout)
+
+    ##########################################################################################################
+    # Value of the DO on cRIO port, the cached value when count is None, else the first value
+    # received after count responses (raises socket.timeout when none arrives within timeout)
+    async def getDO(self, port:int, count:int = None, timeout:float = 1.0):
+        state = self._doStates.get(port)
+        if count is None:
+            return state.value if state is not None else None
+        if state is not None and state.count > count:
+            return state.value
+        waiter = (port, count, asyncio.get_running_loop().create_future())
+        self._doWaiters.append(waiter)
+        try:
+            return (await asyncio.wait_for(waiter[2], timeout)).value
+        except asyncio.TimeoutError:
+            raise socket.timeout("No response from DO " + str(port) + " within " + str(timeout) + "s")
+        finally:
+            if waiter in self._doWaiters:
+                self._doWaiters.remove(waiter)
+
+    # Response endpoint callback, every datagram updates the state of its port, malformed ones are dropped
+    def _handleResponse(self, message):
+        try:
+            port, value = DOListener.decodeResponse(message)
+        except Exception:
+            return
+        previous = self._doStates.get(port)
+        state = DOListener.DOState(port, value, time.monotonic(), previous.count + 1 if previous is not None else 1)
+        self._doStates[port] = state
+        for waiterPort, count, future in self._doWaiters:
+            if waiterPort == port and state.count > count and not future.done():
+                future.set_result(state)
+
+    ##########################################################################################################
+    # Call setter(*value) for each value at the given rate (Hz) until values are exhausted.  Deadlines
+    # are absolute so the stream does not drift; run several streams concurrently with asyncio.gather.
+    async def stream(self, setter, values, rate:float):
+        period = 1.0 / rate
+        deadline = time.monotonic()
+        for value in values:
+            if isinstance(value, tuple):
+                setter(*value)
+            else:
+                setter(value)
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
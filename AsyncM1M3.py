@@ -0,0 +1,314 @@
+import asyncio
+import time
+import SALPY_m1m3
+import Logger
+from Utilities import Log, Notifier, logger
+
+'''
+asyncio command client for M1M3.  Commands are issued immediately and return
+a CommandHandle to await later, so several commands can be in flight and a
+test only waits where it needs the outcome:
+
+    m1m3 = AsyncM1M3(M1M3.M1M3())
+    await m1m3.Start("Default")                          # issue and wait
+    standby = m1m3.Standby()                             # issue, wait later
+    state = await m1m3.nextEvent('DetailedState', lambda data: data.DetailedState == 5)
+    await standby
+    await m1m3.sequence(lambda: m1m3.Start("Default"), lambda: m1m3.Enable())
+
+One poller task drains the SAL command acknowledgements (getResponse_*) of
+every command with handles in flight and the events being waited on, so all
+completions and events are served from one loop.  Each handle has its own
+timeout.  An error polling a command or event fails the handles or waiters of
+that name, a callback that raises is counted in callbackErrors and logged,
+and if the poller stops for any other reason everything in flight fails
+rather than waiting forever.
+'''
+
+class CommandFailed(Exception):
+    pass
+
+class CommandHandle:
+
+    def __init__(self, name:str, cmdId:int, timeout:float, future:asyncio.Future):
+        self.name = name
+        self.cmdId = cmdId
+        self.timeout = timeout
+        self.issued = time.monotonic()
+        self.deadline = self.issued + timeout
+        self.future = future
+        # last acknowledgement, see the SAL__CMD_* codes
+        self.ack = None
+        self.error = 0
+        self.result = ''
+        self.completed = None
+
+    def done(self):
+        return self.future.done()
+
+    def elapsed(self):
+        end = self.completed if self.completed is not None else time.monotonic()
+        return end - self.issued
+
+    def __await__(self):
+        return self.future.__await__()
+
+    def __repr__(self):
+        return "CommandHandle(%s, %d, ack=%s)" % (self.name, self.cmdId, self.ack)
+#end class CommandHandle
+
+class AsyncM1M3:
+
+    # m1m3 is an M1M3.M1M3, its SAL instance is used for everything
+    def __init__(self, m1m3, pollInterval:float = 0.001, defaultTimeout:float = 10.0):
+        self.sal = m1m3.sal
+        self.pollInterval = pollInterval
+        self.defaultTimeout = defaultTimeout
+        self._pending = {}
+        self._eventWaiters = {}
+        self._eventCallbacks = {}
+        # M1M3 subscribes to DetailedState when it initializes SAL
+        self._subscribedEvents = {'DetailedState'}
+        self._poller = None
+        self.callbackErrors = 0
+        self.lastCallbackError = None
+        # notified whenever an acknowledgement or event arrives, for WaitUntil in other threads
+        self.notifier = Notifier()
+
+    ##########################################################################################################
+    # Issue command name with the given data fields, returns its CommandHandle without waiting
+    def issue(self, name:str, timeout:float = None, **fields):
+        Log("AsyncM1M3: %s(%s)", name, ", ".join("%s=%s" % item for item in fields.items()))
+        data = getattr(SALPY_m1m3, "m1m3_command_" + name + "C")()
+        for field, value in fields.items():
+            setattr(data, field, value)
+        cmdId = getattr(self.sal, "issueCommand_" + name)(data)
+        if cmdId <= 0:
+            raise CommandFailed("Failed to issue " + name + ", issueCommand returned " + str(cmdId))
+        handle = CommandHandle(name, cmdId, timeout if timeout is not None else self.defaultTimeout,
+                               asyncio.get_running_loop().create_future())
+        self._pending.setdefault(name, {})[cmdId] = handle
+        self._ensurePoller()
+        return handle
+
+    def Start(self, settingsToApply, run = True, timeout:float = None):
+        return self.issue("Start", timeout, Start = run, SettingsToApply = settingsToApply)
+
+    def Enable(self, run = True, timeout:float = None):
+        return self.issue("Enable", timeout, Enable = run)
+
+    def RaiseM1M3(self, bypassReferencePosition, run = True, timeout:float = None):
+        return self.issue("RaiseM1M3", timeout, RaiseM1M3 = run, BypassReferencePosition = bypassReferencePosition)
+
+    def AbortRaiseM1M3(self, run = True, timeout:float = None):
+        return self.issue("AbortRaiseM1M3", timeout, AbortRaiseM1M3 = run)
+
+    def LowerM1M3(self, run = True, timeout:float = None):
+        return self.issue("LowerM1M3", timeout, LowerM1M3 = run)
+
+    def EnterEngineering(self, run = True, timeout:float = None):
+        return self.issue("EnterEngineering", timeout, EnterEngineering = run)
+
+    def ExitEngineering(self, run = True, timeout:float = None):
+        return self.issue("ExitEngineering", timeout, ExitEngineering = run)
+
+    def Disable(self, run = True, timeout:float = None):
+        return self.issue("Disable", timeout, Disable = run)
+
+    def Standby(self, run = True, timeout:float = None):
+        return self.issue("Standby", timeout, Standby = run)
+
+    def Shutdown(self, run = True, timeout:float = None):
+        return self.issue("Shutdown", timeout, Shutdown = run)
+
+    ##########################################################################################################
+    # Run the steps in order, each a callable returning a CommandHandle (or any awaitable).  A step is
+    # only issued once the previous one completed, the first failure stops the sequence and is raised.
+    async def sequence(self, *steps):
+        results = []
+        for step in steps:
+            results.append(await step())
+        return results
+
+    # Await several handles issued together, returns their acknowledgements in order
+    async def gather(self, *handles):
+        return await asyncio.gather(*handles)
+
+    ##########################################################################################################
+    # Wait for the next event name (a m1m3_logevent_<name>C) accepted by predicate, None accepts any
+    async def nextEvent(self, name:str, predicate = None, timeout:float = None):
+        self._subscribe(name)
+        future = asyncio.get_running_loop().create_future()
+        waiter = (predicate, future)
+        self._eventWaiters.setdefault(name, []).append(waiter)
+        self._ensurePoller()
+        try:
+            return await asyncio.wait_for(future, timeout if timeout is not None else self.defaultTimeout)
+        finally:
+            waiters = self._eventWaiters.get(name, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+
+    # Call callback(data) for every event name until removeEventCallback, from the poller task
+    def addEventCallback(self, name:str, callback):
+        self._subscribe(name)
+        self._eventCallbacks.setdefault(name, []).append(callback)
+        self._ensurePoller()
+
+    def removeEventCallback(self, name:str, callback):
+        self._eventCallbacks.get(name, []).remove(callback)
+
+    def _subscribe(self, name:str):
+        if name not in self._subscribedEvents:
+            self.sal.salEvent("m1m3_logevent_" + name)
+            self._subscribedEvents.add(name)
+
+    def _ensurePoller(self):
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.get_running_loop().create_task(self._poll())
+
+    def _busy(self):
+        return (any(self._pending.values()) or any(self._eventWaiters.values())
+                or any(self._eventCallbacks.values()))
+
+    ##########################################################################################################
+    # Poll until nothing is in flight, sleeping pollInterval whenever a pass found nothing new
+    async def _poll(self):
+        try:
+            while self._busy():
+                progressed = self._pollCommands()
+                progressed = self._pollEvents() or progressed
+                self._expire()
+                if progressed:
+                    self.notifier.notify()
+                    # let the awaiting tasks run before the next pass
+                    await asyncio.sleep(0)
+                else:
+                    await asyncio.sleep(self.pollInterval)
+        except asyncio.CancelledError:
+            self._failAll(CommandFailed("The poller was cancelled"))
+            raise
+        except Exception as error:
+            logger.log(Logger.WARNING, "AsyncM1M3: The poller stopped: %r", error)
+            self._failAll(error)
+
+    def _pollCommands(self):
+        progressed = False
+        for name, handles in self._pending.items():
+            if not handles:
+                continue
+            try:
+                progressed = self._pollCommand(name, handles) or progressed
+            except Exception as error:
+                # a failing getResponse_ lookup fails the handles of name, not the poller
+                for handle in handles.values():
+                    if not handle.future.done():
+                        handle.future.set_exception(error)
+                handles.clear()
+        return progressed
+
+    def _pollCommand(self, name:str, handles):
+        progressed = False
+        getResponse = getattr(self.sal, "getResponse_" + name)
+        while True:
+            ack = SALPY_m1m3.m1m3_ackcmdC()
+            cmdId = getResponse(ack)
+            if cmdId <= 0:
+                break
+            progressed = True
+            handle = handles.get(cmdId)
+            if handle is None:
+                # issued by someone else, or already timed out
+                continue
+            handle.ack = ack.ack
+            handle.error = ack.error
+            handle.result = ack.result
+            if ack.ack == SALPY_m1m3.SAL__CMD_COMPLETE:
+                del handles[cmdId]
+                handle.completed = time.monotonic()
+                if not handle.future.done():
+                    handle.future.set_result(ack)
+            elif ack.ack < 0:
+                del handles[cmdId]
+                handle.completed = time.monotonic()
+                if not handle.future.done():
+                    handle.future.set_exception(CommandFailed("%s(%d) failed with ack %d, error %d: %s"
+                                                              % (name, cmdId, ack.ack, ack.error, ack.result)))
+        return progressed
+
+    def _pollEvents(self):
+        progressed = False
+        for name in set(self._eventWaiters) | set(self._eventCallbacks):
+            waiters = self._eventWaiters.get(name)
+            callbacks = self._eventCallbacks.get(name)
+            if not waiters and not callbacks:
+                continue
+            try:
+                progressed = self._pollEvent(name, waiters, callbacks) or progressed
+            except Exception as error:
+                # a failing getEvent_ lookup fails the waiters of name, not the poller
+                for predicate, future in list(waiters or ()):
+                    if not future.done():
+                        future.set_exception(error)
+        return progressed
+
+    def _pollEvent(self, name:str, waiters, callbacks):
+        progressed = False
+        getEvent = getattr(self.sal, "getEvent_" + name)
+        dataType = getattr(SALPY_m1m3, "m1m3_logevent_" + name + "C")
+        while True:
+            data = dataType()
+            if getEvent(data) != SALPY_m1m3.SAL__OK:
+                break
+            progressed = True
+            for callback in list(callbacks or ()):
+                try:
+                    callback(data)
+                except Exception as error:
+                    self.callbackErrors += 1
+                    self.lastCallbackError = repr(error)
+                    logger.log(Logger.WARNING, "AsyncM1M3: Callback for %s raised %r", name, error)
+            for predicate, future in list(waiters or ()):
+                if future.done():
+                    continue
+                try:
+                    accepted = predicate is None or predicate(data)
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                if accepted:
+                    future.set_result(data)
+        return progressed
+
+    def _expire(self):
+        now = time.monotonic()
+        for name, handles in self._pending.items():
+            for cmdId in [cmdId for cmdId, handle in handles.items() if now >= handle.deadline]:
+                handle = handles.pop(cmdId)
+                if not handle.future.done():
+                    handle.future.set_exception(CommandFailed("%s(%d) did not complete within %0.3fs, last ack %s"
+                                                              % (name, cmdId, handle.timeout, handle.ack)))
+
+    # Fail every handle and event waiter in flight with error, when the poller stops
+    def _failAll(self, error):
+        for handles in self._pending.values():
+            for handle in handles.values():
+                if not handle.future.done():
+                    handle.future.set_exception(error)
+            handles.clear()
+        for waiters in self._eventWaiters.values():
+            for predicate, future in waiters:
+                if not future.done():
+                    future.set_exception(error)
+
+    # Fail every command in flight and stop polling
+    def cancel(self):
+        for handles in self._pending.values():
+            for handle in handles.values():
+                if not handle.future.done():
+                    handle.future.cancel()
+            handles.clear()
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+#end class AsyncM1M3
@@ -0,0 +1,101 @@
+import asyncio
+
+'''
+asyncio datagram endpoints with the same send interface as UDP.UDP, so the
+CellSimulator set* methods work unchanged on top of them.  Sends never block,
+the transport buffers the datagram if the socket is not writable.
+
+Received datagrams go to handler(data) when it is set, otherwise to a queue
+read with get() that keeps the newest maxQueued datagrams.
+'''
+
+class AsyncUDP(asyncio.DatagramProtocol):
+
+    def __init__(self, ip_address, port_number, maxQueued:int = 1024):
+        self.UDP_IP = ip_address
+        self.UDP_PORT = port_number
+        self.server_address = (ip_address, port_number)
+        self.transport = None
+        self.framesSent = 0
+        self.datagramsSent = 0
+        self.bytesSent = 0
+        self._queue = asyncio.Queue(maxQueued)
+        self.handler = None
+        self.dropped = 0
+        # TrafficCapture.TrafficRecorder, every datagram sent is recorded with captureKind when set
+        self.recorder = None
+        self.captureKind = 0
+
+    ##########################################################################################################
+    # Create a client endpoint sending to ip_address:port_number
+    @classmethod
+    async def open(cls, ip_address, port_number):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: cls(ip_address, port_number), remote_addr=(ip_address, port_number))
+        return protocol
+
+    ##########################################################################################################
+    # Create a server endpoint bound to ip_address:port_number, received datagrams are read with get()
+    @classmethod
+    async def bind(cls, ip_address, port_number):
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.create_datagram_endpoint(
+            lambda: cls(ip_address, port_number), local_addr=(ip_address, port_number))
+        return protocol
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.handler is not None:
+            self.handler(data)
+            return
+        if self._queue.full():
+            # nobody is reading, the oldest datagram goes
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable and similar, the simulator keeps sending like the blocking version does
+        pass
+
+    def send(self, message):
+        if isinstance(message, str):
+            message = message.encode()
+        elif not isinstance(message, (bytes, bytearray, memoryview)):
+            # asyncio only takes the builtin buffer types, NumPy slices are wrapped
+            message = memoryview(message)
+        self.transport.sendto(message)
+        if self.recorder is not None:
+            self.recorder.record(self.UDP_PORT, self.captureKind, message)
+        self.framesSent += 1
+        self.datagramsSent += 1
+        self.bytesSent += len(message)
+
+    # Frames are coalesced into one datagram, each keeps its leading length byte
+    def sendFrames(self, frames):
+        message = b''.join(frames)
+        self.transport.sendto(message)
+        if self.recorder is not None:
+            self.recorder.record(self.UDP_PORT, self.captureKind, message)
+        self.framesSent += len(frames)
+        self.datagramsSent += 1
+        self.bytesSent += len(message)
+
+    # Nothing is queued, sends go straight to the transport, for the UDP.UDP interface
+    def flush(self):
+        pass
+
+    def resetCounters(self):
+        self.framesSent = 0
+        self.datagramsSent = 0
+        self.bytesSent = 0
+
+    async def get(self, timeout:float = 1.0):
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
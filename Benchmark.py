@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import CRC
+import ILCSimulator
+import InclinometerSimulator
+import DisplaceSimulator
+import AccelSimulator
+import DigitalInputSimulator
+import DigitalOutputSimulator
+import CellSimulator
+
+'''
+Micro benchmarks for every simulator encoder, the CRC, the ILC routing and a
+composite "one mirror tick".  Each benchmark reports ns/frame and frames/s
+(the best of several repeats), and can be compared to stored baselines:
+
+    python Benchmark.py                       compare against benchmark_baseline.json
+    python Benchmark.py --save-baseline       store the current results as the baseline
+    python Benchmark.py --threshold 0.5       allow 50% slowdown before failing
+    python Benchmark.py --filter ILC          only run benchmarks whose name contains ILC
+
+The exit code is 1 when any benchmark is slower than its baseline by more than
+the threshold.  Baselines are machine specific, regenerate them on the machine
+the comparison runs on.
+'''
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+DEFAULT_THRESHOLD = 0.25
+
+class Benchmark:
+
+    # function is called with no arguments and produces framesPerCall frames
+    def __init__(self, name:str, function, framesPerCall:int = 1):
+        self.name = name
+        self.function = function
+        self.framesPerCall = framesPerCall
+
+    ##########################################################################################################
+    # Calibrate the number of calls to about minTime seconds, return the best ns/frame of repeat runs
+    def run(self, minTime:float = 0.05, repeat:int = 5):
+        function = self.function
+        calls = 1
+        while True:
+            start = time.perf_counter()
+            for i in range(calls):
+                function()
+            elapsed = time.perf_counter() - start
+            if elapsed >= minTime / 4:
+                break
+            calls *= 4
+        calls = max(1, int(calls * minTime / max(elapsed, 1e-9)))
+        best = None
+        for i in range(repeat):
+            start = time.perf_counter()
+            for j in range(calls):
+                function()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        return best * 1e9 / (calls * self.framesPerCall)
+
+def ilcBenchmarks():
+    ilcs = ILCSimulator.ILCSimulator()
+    calibration = tuple(float(i) * 1.5 for i in range(24))
+    return [
+        Benchmark('ILC 17 reportServerId', lambda: ilcs.reportServerId(1, 'ABCDEF', 1, 4, 1, 2, 1, 0, 'Firmware Name')),
+        Benchmark('ILC 18 reportServerStatus', lambda: ilcs.reportServerStatus(1, 2, 512, 256)),
+        Benchmark('ILC 65 ilcMode', lambda: ilcs.ilcMode(1, 2)),
+        Benchmark('ILC 66 stepMotorCommand', lambda: ilcs.stepMotorCommand(1, 0, 4096, 3203.46)),
+        Benchmark('ILC 67 forceAndStatusRequest', lambda: ilcs.forceAndStatusRequest(1, 0, -32, 3.4601)),
+        Benchmark('ILC 72 setIlcTemporaryAddress', lambda: ilcs.setIlcTemporaryAddress(1, 72)),
+        Benchmark('ILC 73 setBoostValueDcaGains', lambda: ilcs.setBoostValueDcaGains(1)),
+        Benchmark('ILC 74 readBoostValueDcaGains', lambda: ilcs.readBoostValueDcaGains(1, 1.5, 2.5)),
+        Benchmark('ILC 75 singlePneumaticAxisForce', lambda: ilcs.singlePneumaticAxisForce(0, 1, 123.4)),
+        Benchmark('ILC 75 dualPneumaticAxisForce', lambda: ilcs.dualPneumaticAxisForce(17, 0, 123.4, -56.7)),
+        Benchmark('ILC 76 singlePneumaticForceAndStatus', lambda: ilcs.singlePneumaticForceAndStatus(0, 1, 123.4)),
+        Benchmark('ILC 76 dualPneumaticForceAndStatus', lambda: ilcs.dualPneumaticForceAndStatus(17, 0, 123.4, -56.7)),
+        Benchmark('ILC 80 setAdcSampleRate', lambda: ilcs.setAdcSampleRate(1, 11)),
+        Benchmark('ILC 81 setAdcChannelOffsetAndSensitivity', lambda: ilcs.setAdcChannelOffsetAndSensitivity(1)),
+        Benchmark('ILC 82 readDacValues', lambda: ilcs.readDacValues(1, 1, 2, 3, 4)),
+        Benchmark('ILC 107 reset', lambda: ilcs.reset(1)),
+        Benchmark('ILC 110 readCalibrationData', lambda: ilcs.readCalibrationData(1, *calibration)),
+        Benchmark('ILC 119 readDcaPressureValues', lambda: ilcs.readDcaPressureValues(1, 1.0, 2.0, 3.0, 4.0)),
+        Benchmark('ILC 120 reportDcaId', lambda: ilcs.reportDcaId(1, 'ABCDEF', 2, 300)),
+        Benchmark('ILC 121 reportDcaStatus', lambda: ilcs.reportDcaStatus(1, 5)),
+        Benchmark('ILC 122 readLVDT', lambda: ilcs.readLVDT(1, 1.2, 2.3)),
+        ]
+
+def digitalBenchmarks():
+    diSim = DigitalInputSimulator.DigitalInputSimulator()
+    doSim = DigitalOutputSimulator.DigitalOutputSimulator()
+    benchmarks = []
+    for name in ('powerNetworkShutDown', 'fansHeatersPumpPoweredOff', 'laserTrackerOff', 'airSupplyClosedAirReliefOpen',
+                 'gisEarthquakeSignal', 'gisEStop', 'tmaMotionStop', 'gisHeartbeatLost', 'airSupplyValveStatusOpen',
+                 'airSupplyValveStatusClosed', 'mirrorCellLightsOn'):
+        encoder = getattr(diSim, name)
+        benchmarks.append(Benchmark('DI ' + name, lambda encoder = encoder: encoder(1)))
+    for name in ('requestHeartBeatSafetyController', 'requestCriticalFaultSafetyController', 'requestMirrorLowerRaisingToSafetyController',
+                 'requestMirrorParkedToSafetyController', 'requestAirSupplyControlValve', 'requestMirrorCellLightsRemoteControl',
+                 'requestAuxPowerNetworkAOn', 'requestAuxPowerNetworkBOn', 'requestAuxPowerNetworkCOn', 'requestAuxPowerNetworkDOn',
+                 'requestPowerNetworkAOn', 'requestPowerNetworkBOn', 'requestPowerNetworkCOn', 'requestPowerNetworkDOn'):
+        encoder = getattr(doSim, name)
+        benchmarks.append(Benchmark('DO ' + name, encoder))
+    return benchmarks
+
+def sensorBenchmarks():
+    inclinSim = InclinometerSimulator.InclinometerSimulator()
+    displaceSim = DisplaceSimulator.DisplacementSimulator()
+    accelSim = AccelSimulator.AccelSimulator()
+    crcData = bytearray([127, 3, 4, 140, 161, 0, 0])
+    return [
+        Benchmark('Inclinometer inclinometerResponse', lambda: inclinSim.inclinometerResponse(36.001)),
+        Benchmark('Displacement displacementResponse', lambda: displaceSim.displacementResponse(
+            -19.7297, 4.8019, 6.0861, 4.2432, 5.0091, 5.3213, 2.0120, 11.0113)),
+        Benchmark('Accelerometer accelerometerResponse', lambda: accelSim.accelerometerResponse(1, 2.3, -1.2)),
+        Benchmark('CRC Simulator.calculateCRC', lambda: inclinSim.calculateCRC(bytearray(crcData))),
+        Benchmark('CRC calculateCRC', lambda: CRC.calculateCRC(crcData)),
+        ]
+
+def cellBenchmarks(sim):
+    ids = sim._faBatchEncoder.ids
+    primary = np.linspace(-500.0, 500.0, len(ids))
+    secondary = np.linspace(100.0, -100.0, len(ids))
+    hardpointIds = (1, 2, 3, 4, 5, 6)
+
+    def mirrorTick():
+        sim.setFAForceAndStatusBatch(ids, 0, primary, secondary)
+        for id in hardpointIds:
+            sim.setHPForceAndStatus(id, 0, 4096, 123.4)
+        sim.setInclinometer(36.001)
+        sim.setDisplacement(-19.7297, 4.8019, 6.0861, 4.2432, 5.0091, 5.3213, 2.0120, 11.0113)
+        sim.setAccelerometerVoltage(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8)
+
+    # 2 frames per force actuator, 1 per hardpoint, inclinometer, displacement and 4 accelerometer frames
+    tickFrames = 2 * len(ids) + len(hardpointIds) + 1 + 1 + 4
+    return [
+        Benchmark('Cell getSubnetAndAddress', lambda: sim.getSubnetAndAddress(443)),
+        Benchmark('Cell setFAForceAndStatusBatch encode', lambda: sim._faBatchEncoder.encode(ids, 0, primary, secondary), 2 * len(ids)),
+        Benchmark('Cell one mirror tick', mirrorTick, tickFrames),
+        ]
+
+def allBenchmarks(sim = None):
+    benchmarks = ilcBenchmarks() + digitalBenchmarks() + sensorBenchmarks()
+    if sim is not None:
+        benchmarks += cellBenchmarks(sim)
+    return benchmarks
+
+def loadBaseline(path:str):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as baselineFile:
+        return json.load(baselineFile)
+
+def saveBaseline(path:str, results):
+    with open(path, 'w') as baselineFile:
+        json.dump(results, baselineFile, indent=2, sort_keys=True)
+        baselineFile.write('\n')
+
+##########################################################################################################
+# Run the benchmarks, print a table and return (results, regressions), results are ns/frame by name
+def runBenchmarks(benchmarks, baseline = {}, threshold:float = DEFAULT_THRESHOLD, minTime:float = 0.05, repeat:int = 5):
+    results = {}
+    regressions = []
+    print("%-45s %12s %14s %12s %8s" % ("Benchmark", "ns/frame", "frames/s", "baseline", "change"))
+    for benchmark in benchmarks:
+        nsPerFrame = benchmark.run(minTime, repeat)
+        results[benchmark.name] = nsPerFrame
+        line = "%-45s %12.1f %14.0f" % (benchmark.name, nsPerFrame, 1e9 / nsPerFrame)
+        if benchmark.name in baseline:
+            change = nsPerFrame / baseline[benchmark.name] - 1.0
+            line += " %12.1f %+7.1f%%" % (baseline[benchmark.name], change * 100.0)
+            if change > threshold:
+                regressions.append(benchmark.name)
+                line += "  REGRESSION"
+        print(line)
+    return results, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulator encoder micro benchmarks')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline file (json, ns/frame by benchmark)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='allowed slowdown as a fraction')
+    parser.add_argument('--filter', default=None, help='only run benchmarks whose name contains this text')
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per repeat')
+    parser.add_argument('--repeat', type=int, default=5, help='repeats per benchmark, the best is kept')
+    parser.add_argument('--no-cell', action='store_true', help='skip the CellSimulator benchmarks (they open sockets)')
+    args = parser.parse_args()
+
+    sim = None
+    if not args.no_cell:
+        # frames go to localhost, nothing needs to listen
+        sim = CellSimulator.CellSimulator("127.0.0.1")
+    benchmarks = allBenchmarks(sim)
+    if args.filter is not None:
+        benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+    baseline = {} if args.save_baseline else loadBaseline(args.baseline)
+    results, regressions = runBenchmarks(benchmarks, baseline, args.threshold, args.min_time, args.repeat)
+    if args.save_baseline:
+        stored = loadBaseline(args.baseline)
+        stored.update(results)
+        saveBaseline(args.baseline, stored)
+        print("Baseline saved to " + args.baseline)
+    if regressions:
+        print("%d benchmark(s) regressed by more than %0.0f%%: %s" % (len(regressions), args.threshold * 100.0, ", ".join(regressions)))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import numpy as np
+
+'''
+Table driven CRC-16/Modbus (polynomial 0xA001 reflected, initial value 0xFFFF).
+The 256 entry table is computed once on import so each byte costs a single
+lookup instead of eight shift/xor iterations.
+
+The CRC is transmitted little endian (low byte first) after the data.
+calculateCRCArray runs the same table over the rows of a 2D array, one
+vectorized step per column, for encoding whole tables of frames.
+'''
+
+POLYNOMIAL = 0xA001
+INITIAL_VALUE = 0xFFFF
+
+def _buildTable():
+    table = []
+    for value in range(256):
+        crc = value
+        for i in range(8):
+            if (crc & 1) != 0:
+                crc = (crc >> 1) ^ POLYNOMIAL
+            else:
+                crc = crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+CRC_TABLE = _buildTable()
+CRC_TABLE_ARRAY = np.array(CRC_TABLE, dtype=np.uint16)
+
+##########################################################################################################
+# Computing the 16-bit CRC value of data, optionally continuing from a previous crc value
+def calculateCRC(data, crc:int = INITIAL_VALUE):
+    table = CRC_TABLE
+    for aByte in data:
+        crc = (crc >> 8) ^ table[(crc ^ aByte) & 0xFF]
+    return crc
+
+##########################################################################################################
+# Computing the CRC of many frames at once, returns a list with one crc per frame
+def calculateCRCs(frames):
+    table = CRC_TABLE
+    crcs = []
+    for frame in frames:
+        crc = INITIAL_VALUE
+        for aByte in frame:
+            crc = (crc >> 8) ^ table[(crc ^ aByte) & 0xFF]
+        crcs.append(crc)
+    return crcs
+
+##########################################################################################################
+# Computing the CRC of every row of an (N, length) uint8 array of equal length frames, returns (N,) uint16
+def calculateCRCArray(frames):
+    frames = np.asarray(frames, dtype=np.uint8)
+    table = CRC_TABLE_ARRAY
+    crc = np.full(len(frames), INITIAL_VALUE, dtype=np.uint16)
+    for column in frames.T:
+        crc = (crc >> 8) ^ table[(crc ^ column) & 0xFF]
+    return crc
+
+##########################################################################################################
+# Append the CRC (little endian) to aByteArray and return the crc value
+def appendCRC(aByteArray:bytearray):
+    crc = calculateCRC(aByteArray)
+    aByteArray.extend(crc.to_bytes(2, byteorder='little'))
+    return crc
+
+##########################################################################################################
+# Verify a frame that ends with its little endian CRC.  Running the CRC over the data and the
+# transmitted CRC leaves a residue of 0 when the frame is intact.
+def verifyCRC(frame):
+    if len(frame) < 2:
+        return False
+    return calculateCRC(frame) == 0
+
+class CRC16:
+    '''
+    Incremental CRC state, feed it chunks with update() and read the result with value or digest().
+    '''
+
+    def __init__(self, data = b''):
+        self.crc = INITIAL_VALUE
+        if data:
+            self.update(data)
+
+    def update(self, data):
+        self.crc = calculateCRC(data, self.crc)
+        return self
+
+    def reset(self):
+        self.crc = INITIAL_VALUE
+
+    @property
+    def value(self):
+        return self.crc
+
+    def digest(self):
+        return self.crc.to_bytes(2, byteorder='little')
+
+    def copy(self):
+        other = CRC16()
+        other.crc = self.crc
+        return other
+
+###############################################################################
+# main - for testing
+def main():
+    assert(calculateCRC(bytes([0, 1, 2])) == 0x91F1)
+    assert(CRC16(bytes([0])).update(bytes([1, 2])).value == 0x91F1)
+    assert(calculateCRCs([bytes([0, 1, 2]), bytes([127, 3, 4, 140, 161, 0, 0])]) == [0x91F1, 0x461F])
+    assert(calculateCRCArray([[0, 1, 2], [127, 3, 140]]).tolist() == calculateCRCs([bytes([0, 1, 2]), bytes([127, 3, 140])]))
+    frame = bytearray([127, 3, 4, 140, 161, 0, 0])
+    appendCRC(frame)
+    assert(bytes([127, 3, 4, 140, 161, 0, 0, 0x1f, 0x46]) == frame)
+    assert(verifyCRC(frame))
+    frame[3] = 0
+    assert(not verifyCRC(frame))
+    print("Succesfully end testing.")
+
+###############################################################################
+#main()
@@ -1,11 +1,19 @@
 import ILCSimulator
+import ILCBatchEncoder
+import ILCRoutingIndex
 import InclinometerSimulator
 import DisplaceSimulator
 import AccelSimulator
+import AccelerometerModel
 import DigitalInputSimulator
+import DigitalInputState
 import DigitalOutputSimulator
 import time
 import UDP    
+import FrameCache
+import TrafficCapture
+import DOListener
+import Instrumentation
 import socket
 from Utilities import Log
     
@@ -14,49 +22,112 @@ class CellSimulator:
     AccelerometerXDistance = 1.0
     AccelerometerYDistance = 1.0
     AccelerometerZDistance = 1.0
+    # Send the four accelerometer responses of a set*Accelerometer* call as one datagram instead of four
+    AccelerometerSingleDatagram = False
+    SubnetEPort = 5005
+    SubnetAPort = 5006
+    SubnetBPort = 5007
+    SubnetCPort = 5008
+    SubnetDPort = 5009
+    InclinometerPort = 5010
+    DisplacementPort = 5011
+    AccelerometerPort = 5012
+    DigitalInputPort = 5013
+    DigitalOutputPort = 5014
+    ResponsePort = 4999
+    # Float telemetry rarely repeats, these function codes are not cached
+    UncachedFunctionCodes = (67, 75, 76, 119, 122)
   
-    def __init__(self, ipAddress, dbg = False):
+    # responseAddress is the local address the DO responses are received on, the host's address by default.
+    # portOffset shifts every port (the response port too), so several simulators can run side by side.
+    def __init__(self, ipAddress, dbg = False, responseAddress = None, portOffset:int = 0):
         self.Print = dbg
+        self.portOffset = portOffset
+        self._createSimulators()
+
+        self._udpClientSubnetA = UDP.UDP(ipAddress, self.SubnetAPort + portOffset)
+        self._udpClientSubnetB = UDP.UDP(ipAddress, self.SubnetBPort + portOffset)
+        self._udpClientSubnetC = UDP.UDP(ipAddress, self.SubnetCPort + portOffset)
+        self._udpClientSubnetD = UDP.UDP(ipAddress, self.SubnetDPort + portOffset)
+        self._udpClientSubnetE = UDP.UDP(ipAddress, self.SubnetEPort + portOffset)
+        self._udpClientInclin = UDP.UDP(ipAddress, self.InclinometerPort + portOffset)
+        self._udpClientDisplace = UDP.UDP(ipAddress, self.DisplacementPort + portOffset)
+        self._udpClientAccel = UDP.UDP(ipAddress, self.AccelerometerPort + portOffset)
+        self._udpClientDI = UDP.UDP(ipAddress, self.DigitalInputPort + portOffset)
+        self._udpClientDO = UDP.UDP(ipAddress, self.DigitalOutputPort + portOffset)
+        if responseAddress is None:
+            responseAddress = socket.gethostbyname(socket.gethostname())
+        self._udpResponse = UDP.UDP(responseAddress, self.ResponsePort + portOffset, True)
+        self._doListener = DOListener.DOListener(self._udpResponse)
+        self._doListener.start()
+        # When set, the get* DO methods return the cached value if it is younger than this many seconds
+        self.doCacheMaxAge = None
+        self._createRoutes()
+
+    def _createSimulators(self):
         self._ilcSim = ILCSimulator.ILCSimulator()
         self._inclinSim = InclinometerSimulator.InclinometerSimulator()
         self._displaceSim = DisplaceSimulator.DisplacementSimulator()
         self._accelSim = AccelSimulator.AccelSimulator()
+        self._accelModel = AccelerometerModel.AccelerometerModel.fromCellSimulator(self)
         self._diSim = DigitalInputSimulator.DigitalInputSimulator()
+        self._diState = DigitalInputState.DigitalInputState()
         self._doSim = DigitalOutputSimulator.DigitalOutputSimulator()
+        self._frameCache = FrameCache.FrameCache()
+        # Instrumentation.Instrumentation once enableInstrumentation was called
+        self._instrumentation = None
+        # TrafficCapture.TrafficRecorder while startCapture is recording
+        self._recorder = None
+        for functionCode in self.UncachedFunctionCodes:
+            self._frameCache.disable(functionCode)
 
-        self._udpClientSubnetA = UDP.UDP(ipAddress, 5006)
-        self._udpClientSubnetB = UDP.UDP(ipAddress, 5007)
-        self._udpClientSubnetC = UDP.UDP(ipAddress, 5008)
-        self._udpClientSubnetD = UDP.UDP(ipAddress, 5009)
-        self._udpClientSubnetE = UDP.UDP(ipAddress, 5005)
-        self._udpClientInclin = UDP.UDP(ipAddress, 5010)
-        self._udpClientDisplace = UDP.UDP(ipAddress, 5011)
-        self._udpClientAccel = UDP.UDP(ipAddress, 5012)
-        self._udpClientDI = UDP.UDP(ipAddress, 5013)
-        self._udpClientDO = UDP.UDP(ipAddress, 5014)
-        self._udpResponse = UDP.UDP(socket.gethostbyname(socket.gethostname()), 4999, True)
+    # The routes hold the subnet clients, so they are built once the clients exist
+    def _createRoutes(self):
+        self._ilcRoutes = ILCRoutingIndex.ILCRoutingIndex(self.getSubnet)
+        self._faBatchEncoder = ILCBatchEncoder.ForceAndStatusBatchEncoder(self._ilcRoutes)
         
     def setDisplacement(self, d1:float, d2:float, d3:float, d4:float, d5:float, d6:float, d7:float, d8:float):
         if self.Print:
-            Log("CellSimulator: Setting IMS displacements to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)" % (d1, d2, d3, d4, d5, d6, d7, d8))
+            Log("CellSimulator: Setting IMS displacements to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)", d1, d2, d3, d4, d5, d6, d7, d8)
         self._udpClientDisplace.send(self._displaceSim.displacementResponse(d1, d2, d3, d4, d5, d6, d7, d8))
+
+    # Send one response encoded by DisplacementSimulator.displacementResponses (one row)
+    def setDisplacementFrame(self, frame):
+        self._udpClientDisplace.send(frame)
         
     def setInclinometer(self, angle:float):
         if self.Print:
-            Log("CellSimulator: Setting inclinometer angle to %0.3f" % (angle))
+            Log("CellSimulator: Setting inclinometer angle to %0.3f", angle)
         self._udpClientInclin.send(self._inclinSim.inclinometerResponse(angle))
+
+    # Send one response encoded by InclinometerSimulator.InclinometerFrameTable.frames (one row)
+    def setInclinometerFrame(self, frame):
+        self._udpClientInclin.send(frame)
+
+    # Look setInclinometer responses up in an InclinometerFrameTable, mapped from path when given
+    def useInclinometerTable(self, path:str = None):
+        self._inclinSim.frameTable = InclinometerSimulator.InclinometerFrameTable(path)
                 
     def setAccelerometerVoltage(self, a1:float, a2:float, a3:float, a4:float, a5:float, a6:float, a7:float, a8:float):
         if self.Print:
-            Log("CellSimulator: Setting accelerometer voltages to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)" % (a1, a2, a3, a4, a5, a6, a7, a8))
-        self._udpClientAccel.send(self._accelSim.accelerometerResponse(accelerometerNumber = 1, elevationVoltage = a1, azimuthVoltage = a2))
-        self._udpClientAccel.send(self._accelSim.accelerometerResponse(accelerometerNumber = 2, elevationVoltage = a3, azimuthVoltage = a4))
-        self._udpClientAccel.send(self._accelSim.accelerometerResponse(accelerometerNumber = 3, elevationVoltage = a5, azimuthVoltage = a6))
-        self._udpClientAccel.send(self._accelSim.accelerometerResponse(accelerometerNumber = 4, elevationVoltage = a7, azimuthVoltage = a8))
+            Log("CellSimulator: Setting accelerometer voltages to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)", a1, a2, a3, a4, a5, a6, a7, a8)
+        frames = (self._accelSim.accelerometerResponse(accelerometerNumber = 1, elevationVoltage = a1, azimuthVoltage = a2),
+                  self._accelSim.accelerometerResponse(accelerometerNumber = 2, elevationVoltage = a3, azimuthVoltage = a4),
+                  self._accelSim.accelerometerResponse(accelerometerNumber = 3, elevationVoltage = a5, azimuthVoltage = a6),
+                  self._accelSim.accelerometerResponse(accelerometerNumber = 4, elevationVoltage = a7, azimuthVoltage = a8))
+        if self.AccelerometerSingleDatagram:
+            self._udpClientAccel.sendFrames(frames)
+        else:
+            for frame in frames:
+                self._udpClientAccel.send(frame)
+
+    # Send the four responses encoded by AccelerometerModel.encodeFrames (one row) as one datagram
+    def setAccelerometerFrames(self, frames):
+        self._udpClientAccel.send(frames)
         
     def setAccelerometer(self, a1:float, a2:float, a3:float, a4:float, a5:float, a6:float, a7:float, a8:float):
         if self.Print:
-            Log("CellSimulator: Setting accelerometer acceleration to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)" % (a1, a2, a3, a4, a5, a6, a7, a8))
+            Log("CellSimulator: Setting accelerometer acceleration to (%0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f, %0.3f)", a1, a2, a3, a4, a5, a6, a7, a8)
         a1 = a1 / self.AccelerometerVoltsToMetersPerSecondSqrd
         a2 = a2 / self.AccelerometerVoltsToMetersPerSecondSqrd
         a3 = a3 / self.AccelerometerVoltsToMetersPerSecondSqrd
@@ -69,215 +140,231 @@ class CellSimulator:
         
     def setAngularAcceleration(self, ax:float, ay:float, az:float):
         if self.Print:
-            Log("CellSimulator: Setting accelerometer angular acceleration to (%0.3f, %0.3f, %0.3f)" % (ax, ay, az))
-        a8 = (ax / 2.0) * self.AccelerometerXDistance
-        a6 = (-ax / 2.0) * self.AccelerometerXDistance
-        a3 = (ay / 2.0) * self.AccelerometerYDistance
-        a1 = (-ay / 2.0) * self.AccelerometerYDistance
-        a5 = -az * self.AccelerometerZDistance
-        a7 = -az * self.AccelerometerZDistance
-        a2 = 0.0
-        a4 = 0.0
-        self.setAccelerometer(a1, a2, a3, a4, a5, a6, a7, a8)
+            Log("CellSimulator: Setting accelerometer angular acceleration to (%0.3f, %0.3f, %0.3f)", ax, ay, az)
+        # geometry and volts conversion in one step, see AccelerometerModel, rebuilt when an Accelerometer* constant changed
+        model = self._accelModel
+        if not model.matches(self.AccelerometerVoltsToMetersPerSecondSqrd, self.AccelerometerXDistance,
+                             self.AccelerometerYDistance, self.AccelerometerZDistance):
+            model = self._accelModel = AccelerometerModel.AccelerometerModel.fromCellSimulator(self)
+        self.setAccelerometerVoltage(*model.angularToVoltsRow(ax, ay, az))
         
     def setAngularVelocity(self, vx:float, vy:float, vz:float):
         if self.Print:
-            Log("CellSimulator: Setting gyro angular velocity to (%0.3f, %0.3f, %0.3f)" % (vx, vy, vz))
+            Log("CellSimulator: Setting gyro angular velocity to (%0.3f, %0.3f, %0.3f)", vx, vy, vz)
             
         
+    # The digital inputs are active low, the set* methods below send the inverse of their argument
     def setAUXPowerNetworksOff(self, off):
         if self.Print:
-            Log("CellSimulator: Setting AUX power network off to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.powerNetworkShutDown(boolToInt(not on)))
+            Log("CellSimulator: Setting AUX power network off to (%d)", self.boolToInt(off))
+        self._udpClientDI.send(self._diState.set('powerNetworkShutDown', not off, force = True)[0])
         
     def setThermalEquipmentOff(self, off):
         if self.Print:
-            Log("CellSimulator: Setting thermal equipment off to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.fansHeatersPumpPoweredOff(boolToInt(not on)))
+            Log("CellSimulator: Setting thermal equipment off to (%d)", self.boolToInt(off))
+        self._udpClientDI.send(self._diState.set('fansHeatersPumpPoweredOff', not off, force = True)[0])
     
     def setAirSupplyOff(self, off):
         if self.Print:
-            Log("CellSimulator: Setting air supply off to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.airSupplyClosedAirReliefOpen(boolToInt(not on)))
+            Log("CellSimulator: Setting air supply off to (%d)", self.boolToInt(off))
+        self._udpClientDI.send(self._diState.set('airSupplyClosedAirReliefOpen', not off, force = True)[0])
     
     def setCabinetDoorOpen(self, open):
         if self.Print:
-            Log("CellSimulator: Setting cabinet door open to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.gisEarthquakeSignal(boolToInt(not on)))
+            Log("CellSimulator: Setting cabinet door open to (%d)", self.boolToInt(open))
+        self._udpClientDI.send(self._diState.set('gisEarthquakeSignal', not open, force = True)[0])
     
     def setTMAMotionStop(self, stop):
         if self.Print:
-            Log("CellSimulator: Setting TMA motion stop to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.tmaMotionStop(boolToInt(not on)))
+            Log("CellSimulator: Setting TMA motion stop to (%d)", self.boolToInt(stop))
+        self._udpClientDI.send(self._diState.set('tmaMotionStop', not stop, force = True)[0])
     
     def setGISHeartbeatLost(self, lost):
         if self.Print:
-            Log("CellSimulator: Setting GIS heartbeat lost to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.gisHeartbeatLost(boolToInt(not on)))
+            Log("CellSimulator: Setting GIS heartbeat lost to (%d)", self.boolToInt(lost))
+        self._udpClientDI.send(self._diState.set('gisHeartbeatLost', not lost, force = True)[0])
         
     def setAirSupplyValveOpen(self, open):
         if self.Print:
-            Log("CellSimulator: Setting air supply valve open to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.airSupplyValveStatusOpen(boolToInt(not on)))
+            Log("CellSimulator: Setting air supply valve open to (%d)", self.boolToInt(open))
+        self._udpClientDI.send(self._diState.set('airSupplyValveStatusOpen', not open, force = True)[0])
     
     def setAirSupplyValveClosed(self, closed):
         if self.Print:
-            Log("CellSimulator: Setting air supply valve closed to (%d)" % (boolToInt(on)))
-        self._udpClientDI.send(self._diSim.airSupplyValveStatusClosed(boolToInt(not on)))
+            Log("CellSimulator: Setting air supply valve closed to (%d)", self.boolToInt(closed))
+        self._udpClientDI.send(self._diState.set('airSupplyValveStatusClosed', not closed, force = True)[0])
+
+    ##########################################################################################################
+    # Set several digital inputs at once, changes is {DigitalInputState input name or number : bool} in wire
+    # levels, not inverted like the set* methods above.  Only the inputs whose value changed are sent,
+    # together in one datagram.  Returns the number of frames sent.
+    def setDigitalInputs(self, changes):
+        if self.Print:
+            Log("CellSimulator: Setting digital inputs to %s", dict(changes))
+        frames = self._diState.update(changes)
+        if frames:
+            self._udpClientDI.sendFrames(frames)
+        return len(frames)
+
+    # Send every digital input with its current value in one datagram
+    def resyncDigitalInputs(self):
+        if self.Print:
+            Log("CellSimulator: Resynchronizing digital inputs")
+        self._udpClientDI.sendFrames(self._diState.snapshot())
+
+    def getDigitalInputState(self):
+        return self._diState
         
     def getHeartbeatToSafetyController(self):
         if self.Print:
             Log("CellSimulator: Getting heartbeat to safety controller")
-        self._udpClientDO.send(self._doSim.requestHeartBeatSafetyController())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestHeartBeatSafetyController())
         
     def getAirSupplyValve(self):
         if self.Print:
             Log("CellSimulator: Getting air supply valve")
-        self._udpClientDO.send(self._doSim.requestAirSupplyControlValve())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestAirSupplyControlValve())
     
     def getCellLights(self):
         if self.Print:
             Log("CellSimulator: Getting cell lights")
-        self._udpClientDO.send(self._doSim.requestMirrorCellLightsRemoteControl())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestMirrorCellLightsRemoteControl())
         
     def getAUXPowerNetworkAOn(self):
         if self.Print:
             Log("CellSimulator: Getting AUX power network A on")
-        self._udpClientDO.send(self._doSim.requestAuxPowerNetworkAOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestAuxPowerNetworkAOn())
         
     def getAUXPowerNetworkBOn(self):
         if self.Print:
             Log("CellSimulator: Getting AUX power network B on")
-        self._udpClientDO.send(self._doSim.requestAuxPowerNetworkBOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestAuxPowerNetworkBOn())
         
     def getAUXPowerNetworkCOn(self):
         if self.Print:
             Log("CellSimulator: Getting AUX power network C on")
-        self._udpClientDO.send(self._doSim.requestAuxPowerNetworkCOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestAuxPowerNetworkCOn())
         
     def getAUXPowerNetworkDOn(self):
         if self.Print:
             Log("CellSimulator: Getting AUX power network D on")
-        self._udpClientDO.send(self._doSim.requestAuxPowerNetworkDOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestAuxPowerNetworkDOn())
     
     def getPowerNetworkAOn(self):
         if self.Print:
             Log("CellSimulator: Getting power network A on")
-        self._udpClientDO.send(self._doSim.requestPowerNetworkAOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestPowerNetworkAOn())
         
     def getPowerNetworkBOn(self):
         if self.Print:
             Log("CellSimulator: Getting power network B on")
-        self._udpClientDO.send(self._doSim.requestPowerNetworkBOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestPowerNetworkBOn())
         
     def getPowerNetworkCOn(self):
         if self.Print:
             Log("CellSimulator: Getting power network C on")
-        self._udpClientDO.send(self._doSim.requestPowerNetworkCOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestPowerNetworkCOn())
         
     def getPowerNetworkDOn(self):
         if self.Print:
             Log("CellSimulator: Getting power network D on")
-        self._udpClientDO.send(self._doSim.requestPowerNetworkDOn())
-        return self.getDO()
+        return self.requestDO(self._doSim.requestPowerNetworkDOn())
 
     def setILCID(self, id:int, uniqueId:int, ilcAppType:int, networkNodeType:int, ilcSelectedOptions:int, networkNodeOptions:int, majorRev:int, minorRev:int, firmwareName:str):
         if self.Print:
-            Log("CellSimulator: Setting ILC ID for %d to (%d, %d, %d, %d, %d, %d, %d, %s)" % (id, uniqueId, ilcAppType, networkNodeType, ilcSelectedOptions, networkNodeOptions, majorRev, minorRev, firmwareName))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.reportServerId(address, uniqueId, ilcAppType, networkNodeType, ilcSelectedOptions, networkNodeOptions, majorRev, minorRev, firmwareName))
+            Log("CellSimulator: Setting ILC ID for %d to (%d, %d, %d, %d, %d, %d, %d, %s)", id, uniqueId, ilcAppType, networkNodeType, ilcSelectedOptions, networkNodeOptions, majorRev, minorRev, firmwareName)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(17, self._ilcSim.reportServerId, address, uniqueId, ilcAppType, networkNodeType, ilcSelectedOptions, networkNodeOptions, majorRev, minorRev, firmwareName))
         
     def setILCStatus(self, id:int, mode:int, status:int, faults:int):
         if self.Print:
-            Log("CellSimulator: Setting ILC status for %d to (%d, %d, %d)" % (id, mode, status, faults))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.reportServerStatus(address, mode, status, faults))
+            Log("CellSimulator: Setting ILC status for %d to (%d, %d, %d)", id, mode, status, faults)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(18, self._ilcSim.reportServerStatus, address, mode, status, faults))
         
     def setILCMode(self, id:int, ilcMode:int):
         if self.Print:
-            Log("CellSimulator: Setting ILC mode for %d to (%d)" % (id, ilcMode))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.ilcMode(address, ilcMode))
+            Log("CellSimulator: Setting ILC mode for %d to (%d)", id, ilcMode)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(65, self._ilcSim.ilcMode, address, ilcMode))
         
     def setHPForceAndStatus(self, id:int, statusByte:int, ssiEncoderValue:int, loadCellForce:float):
         if self.Print:
-            Log("CellSimulator: Setting HP force and status for %d to (%d, %d, %0.3f)" % (id, statusBy, ssiEncoderValue, loadCellForce))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.forceAndStatusRequest(address, statusByte, ssiEncoderValue, float(loadCellForce)))
+            Log("CellSimulator: Setting HP force and status for %d to (%d, %d, %0.3f)", id, statusByte, ssiEncoderValue, loadCellForce)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(67, self._ilcSim.forceAndStatusRequest, address, statusByte, ssiEncoderValue, float(loadCellForce)))
 
     def setBoostValveGains(self, id:int, primaryCylinderGain:float, secondaryCylinderGain:float):
         if self.Print:
-            Log("CellSimulator: Setting boost valve gains for %d to (%0.3f, %0.3f)" % (id, primaryCylinderGain, secondaryCylinderGain))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.readBoostValueDcaGains(address, float(primaryCylinderGain), float(secondaryCylinderGain)))
+            Log("CellSimulator: Setting boost valve gains for %d to (%0.3f, %0.3f)", id, primaryCylinderGain, secondaryCylinderGain)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(74, self._ilcSim.readBoostValueDcaGains, address, float(primaryCylinderGain), float(secondaryCylinderGain)))
         
     def setFAForceAndStatus(self, id:int, statusByte:int, primaryCylinderForce:float, secondaryCylinderForce:float = 0):
         if self.Print:
-            Log("CellSimulator: Setting FA force and status for %d to (%d, %0.3f, %0.3f)" % (id, statusByte, primaryCylinderForce, secondaryCylinderForce))
-        subnet, address = getSubnetAndAddress(id)
+            Log("CellSimulator: Setting FA force and status for %d to (%d, %0.3f, %0.3f)", id, statusByte, primaryCylinderForce, secondaryCylinderForce)
+        # checked before anything is sent, 75 packs the status signed and 76 unsigned
+        if not ILCBatchEncoder.STATUS_MIN <= statusByte <= ILCBatchEncoder.STATUS_MAX:
+            raise Exception("Status Byte must be in the range [" + str(ILCBatchEncoder.STATUS_MIN) + ", " + str(ILCBatchEncoder.STATUS_MAX) + "]")
+        subnet, address = self.getSubnetAndAddress(id)
         if address <= 16:
-            subnet.send(self._ilcSim.singlePneumaticAxisForce(statusByte, address, float(primaryCylinderForce)))
-            subnet.send(self._ilcSim.singlePneumaticForceAndStatus(statusByte, address, float(primaryCylinderForce)))
+            subnet.send(self._frameCache.encode(75, self._ilcSim.singlePneumaticAxisForce, statusByte, address, float(primaryCylinderForce)))
+            subnet.send(self._frameCache.encode(76, self._ilcSim.singlePneumaticForceAndStatus, statusByte, address, float(primaryCylinderForce)))
         else:
-            subnet.send(self._ilcSim.dualPneumaticAxisForce(address, statusByte, float(primaryCylinderForce), float(secondaryCylinderForce)))
-            subnet.send(self._ilcSim.singlePneumaticForceAndStatus(address, statusByte, float(primaryCylinderForce), float(secondaryCylinderForce)))
+            subnet.send(self._frameCache.encode(75, self._ilcSim.dualPneumaticAxisForce, address, statusByte, float(primaryCylinderForce), float(secondaryCylinderForce)))
+            subnet.send(self._frameCache.encode(76, self._ilcSim.dualPneumaticForceAndStatus, address, statusByte, float(primaryCylinderForce), float(secondaryCylinderForce)))
+
+    # Whole mirror version of setFAForceAndStatus, ids, statusBytes and forces are arrays (or scalars) of equal length.
+    # The frames of each subnet are sent as one datagram.
+    def setFAForceAndStatusBatch(self, ids, statusBytes, primaryCylinderForces, secondaryCylinderForces = 0.0):
+        if self.Print:
+            Log("CellSimulator: Setting FA force and status for %d actuators", len(ids))
+        buffer, slices = self._faBatchEncoder.encode(ids, statusBytes, primaryCylinderForces, secondaryCylinderForces)
+        for subnet, start, end in slices:
+            self.getSubnet(subnet).send(buffer[start:end])
             
     def setADCSampleRate(self, id:int, scanRateCode:int):
         if self.Print:
-            Log("CellSimulator: Setting ADC sample rate for %d to (%d)" % (id, scanRateCode))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.setAdcSampleRate(address, scanRateCode))
+            Log("CellSimulator: Setting ADC sample rate for %d to (%d)", id, scanRateCode)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(80, self._ilcSim.setAdcSampleRate, address, scanRateCode))
         
     def setCalibrationData(self, id:int, mainAdcCalibration1:float, mainAdcCalibration2:float, mainAdcCalibration3:float, mainAdcCalibration4:float, mainSensorOffset1:float, mainSensorOffset2:float, mainSensorOffset3:float, mainSensorOffset4:float, mainSensorSensitivity1:float, mainSensorSensitivity2:float, mainSensorSensitivity3:float, mainSensorSensitivity4:float, backupAdcCalibration1:float, backupAdcCalibration2:float, backupAdcCalibration3:float, backupAdcCalibration4:float, backupSensorOffset1:float, backupSensorOffset2:float, backupSensorOffset3:float, backupSensorOffset4:float, backupSensorSensitivity1:float, backupSensorSensitivity2:float, backupSensorSensitivity3:float, backupSensorSensitivity4:float):
         if self.Print:
-            Log("CellSimulator: Setting calibration data for %d to ()" % (id))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.readCalibrationData(address, mainAdcCalibration1, mainAdcCalibration2, mainAdcCalibration3, mainAdcCalibration4, mainSensorOffset1, mainSensorOffset2, mainSensorOffset3, mainSensorOffset4, mainSensorSensitivity1, mainSensorSensitivity2, mainSensorSensitivity3, mainSensorSensitivity4, backupAdcCalibration1, backupAdcCalibration2, backupAdcCalibration3, backupAdcCalibration4, backupSensorOffset1, backupSensorOffset2, backupSensorOffset3, backupSensorOffset4, backupSensorSensitivity1, backupSensorSensitivity2, backupSensorSensitivity3, backupSensorSensitivity4))
+            Log("CellSimulator: Setting calibration data for %d to ()", id)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(110, self._ilcSim.readCalibrationData, address, mainAdcCalibration1, mainAdcCalibration2, mainAdcCalibration3, mainAdcCalibration4, mainSensorOffset1, mainSensorOffset2, mainSensorOffset3, mainSensorOffset4, mainSensorSensitivity1, mainSensorSensitivity2, mainSensorSensitivity3, mainSensorSensitivity4, backupAdcCalibration1, backupAdcCalibration2, backupAdcCalibration3, backupAdcCalibration4, backupSensorOffset1, backupSensorOffset2, backupSensorOffset3, backupSensorOffset4, backupSensorSensitivity1, backupSensorSensitivity2, backupSensorSensitivity3, backupSensorSensitivity4))
         
     def setPressure(self, id:int, p1:float, p2:float, p3:float, p4:float):
         if self.Print:
-            Log("CellSimulator: Setting pressure for %d to (%0.3f, %0.3f, %0.3f, %0.3f)" % (id, p1, p2, p3, p4))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.readDcaPressureValues(address, p1, p2, p3, p4))
+            Log("CellSimulator: Setting pressure for %d to (%0.3f, %0.3f, %0.3f, %0.3f)", id, p1, p2, p3, p4)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(119, self._ilcSim.readDcaPressureValues, address, p1, p2, p3, p4))
         
     def setMezzanineID(self, id:int, uniqueId:int, firmwareType:int, firmwareVersion:int):
         if self.Print:
-            Log("CellSimulator: Setting mezzanine ID for %d to (%d, %d, %d)" % (id, uniqueId, firmwareType, firmwareVersion))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.reportDcaId(address, uniqueId, firmwareType, firmwareVersion))
+            Log("CellSimulator: Setting mezzanine ID for %d to (%d, %d, %d)", id, uniqueId, firmwareType, firmwareVersion)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(120, self._ilcSim.reportDcaId, address, uniqueId, firmwareType, firmwareVersion))
         
     def setMezzanineStatus(self, id:int, status:int):
         if self.Print:
-            Log("CellSimulator: Setting mezzanine status for %d to (%d)" % (id, status))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.reportDcaStatus(address, status))
+            Log("CellSimulator: Setting mezzanine status for %d to (%d)", id, status)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(121, self._ilcSim.reportDcaStatus, address, status))
         
     def setLVDT(self, id:int, lvdt1:float, lvdt2:float):
         if self.Print:
-            Log("CellSimulator: Setting LVDT for %d to (%0.3f, %0.3f)" % (id, lvdt1, lvdt2))
-        subnet, address = getSubnetAndAddress(id)
-        subnet.send(self._ilcSim.readLVDT(address, lvdt1, lvdt2))
+            Log("CellSimulator: Setting LVDT for %d to (%0.3f, %0.3f)", id, lvdt1, lvdt2)
+        subnet, address = self.getSubnetAndAddress(id)
+        subnet.send(self._frameCache.encode(122, self._ilcSim.readLVDT, address, lvdt1, lvdt2))
                 
     def getSubnetAndAddress(self, id:int):
-        for row in hardpointActuatorTable:
-            if row[hardpointActuatorTableIDIndex] == id:
-                return getSubnet(row[hardpointActuatorTableSubnetIndex]), row[hardpointActuatorTableAddressIndex]
-        for row in hardpointMonitorTable:
-            if row[hardpointMonitorTableIDIndex] == id:
-                return getSubnet(row[hardpointMonitorTableSubnetIndex]), row[hardpointMonitorTableAddressIndex]
-        for row in forceActuatorTable:
-            if row[forceActuatorTableIDIndex] == id:
-                return getSubnet(row[forceActuatorTableSubnetIndex]), row[forceActuatorTableAddressIndex]
+        route = self._ilcRoutes.route(id)
+        return route.subnet, route.address
+
+    def getIdForSubnetAndAddress(self, subnet:int, address:int):
+        return self._ilcRoutes.idForSubnetAndAddress(subnet, address)
         
     def getSubnet(self, subnet:int):
         if subnet == 1:
@@ -292,13 +379,112 @@ class CellSimulator:
             return self._udpClientSubnetE
         return 0
         
+    def getFrameCacheStats(self):
+        return self._frameCache.stats()
+
+    ##########################################################################################################
+    # Count the calls of every set*/get* method and time the encoders, the ILC routing and the sends,
+    # see Instrumentation.  Nothing is wrapped until this is called, so it costs nothing when off.
+    def enableInstrumentation(self):
+        if self._instrumentation is None:
+            self._instrumentation = Instrumentation.Instrumentation()
+        if not self._instrumentation.attached():
+            self._instrumentation.attach(self)
+
+    # Restore the original methods, the collected statistics are kept until resetStats
+    def disableInstrumentation(self):
+        if self._instrumentation is not None:
+            self._instrumentation.detach()
+
+    ##########################################################################################################
+    # Snapshot of the per stream frame, datagram and byte counters, the frame cache and, once
+    # instrumentation was enabled, the call counts and the encode, routing and send latencies (ns)
+    def stats(self):
+        snapshot = {'streams' : {kind : {'frames' : client.framesSent, 'datagrams' : client.datagramsSent, 'bytes' : client.bytesSent}
+                                 for client, kind in self.getClients()},
+                    'frameCache' : self._frameCache.stats()}
+        if self._instrumentation is not None:
+            snapshot.update(self._instrumentation.stats())
+        return snapshot
+
+    def resetStats(self):
+        for client, kind in self.getClients():
+            client.resetCounters()
+        self._frameCache.resetStats()
+        if self._instrumentation is not None:
+            self._instrumentation.resetStats()
+
+    # Every client with its capture stream kind
+    def getClients(self):
+        return [(self._udpClientSubnetA, 'Subnet A'), (self._udpClientSubnetB, 'Subnet B'), (self._udpClientSubnetC, 'Subnet C'),
+                (self._udpClientSubnetD, 'Subnet D'), (self._udpClientSubnetE, 'Subnet E'), (self._udpClientInclin, 'Inclinometer'),
+                (self._udpClientDisplace, 'Displacement'), (self._udpClientAccel, 'Accelerometer'), (self._udpClientDI, 'DI'),
+                (self._udpClientDO, 'DO')]
+
+    ##########################################################################################################
+    # Record every datagram sent from now on to the capture at path, see TrafficCapture
+    def startCapture(self, path:str, indexInterval:int = 64):
+        if self._recorder is not None:
+            raise Exception("A capture is already running to " + self._recorder.path)
+        if self.Print:
+            Log("CellSimulator: Starting capture to %s", path)
+        self._recorder = TrafficCapture.TrafficRecorder(path, indexInterval)
+        for client, kind in self.getClients():
+            client.captureKind = TrafficCapture.kindForName(kind)
+            client.recorder = self._recorder
+
+    # Stop recording and close the capture, returns the number of datagrams recorded
+    def stopCapture(self):
+        if self._recorder is None:
+            return 0
+        for client, kind in self.getClients():
+            client.flush()
+            client.recorder = None
+        self._recorder.close()
+        records = self._recorder.records
+        if self.Print:
+            Log("CellSimulator: Stopped capture to %s, %d datagrams recorded", self._recorder.path, records)
+        self._recorder = None
+        return records
+
+    # Stop the DO listener and close every socket, the response port can be bound again afterwards
+    def close(self):
+        self.stopCapture()
+        self._doListener.stop()
+        for client, kind in self.getClients():
+            client.flush()
+            client.sock.close()
+        self._udpResponse.sock.close()
+
     def boolToInt(self, b):
         if b:
             return 1
         return 0
         
-    def getDO(self):
-        message = self._udpResponse.get()
-        return not (message[1] == ord("0"))
+    ##########################################################################################################
+    # Send a DO request ([length, cRIO port]) and wait for the response of that port
+    def requestDO(self, request, timeout:float = 1.0):
+        port = request[1]
+        if self.doCacheMaxAge is not None:
+            state = self._doListener.getState(port)
+            if state is not None and time.monotonic() - state.timestamp <= self.doCacheMaxAge:
+                return state.value
+        count = self._doListener.count(port)
+        self._udpClientDO.send(request)
+        return self.getDO(port, count, timeout)
+
+    ##########################################################################################################
+    # Value of the DO on cRIO port, the cached value when count is None, else the first value
+    # received after count responses (raises socket.timeout when none arrives within timeout)
+    def getDO(self, port:int, count:int = None, timeout:float = 1.0):
+        if count is None:
+            return self._doListener.get(port)
+        state = self._doListener.wait(port, count, timeout)
+        if state is None:
+            raise socket.timeout("No response from DO " + str(port) + " within " + str(timeout) + "s")
+        return state.value
+
+    def getDOListener(self):
+        return self._doListener
         
         
\ No newline at end of file
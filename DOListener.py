@@ -0,0 +1,177 @@
+import selectors
+import threading
+import time
+from collections import namedtuple
+import Logger
+from Utilities import Notifier, logger
+
+'''
+Background listener for the digital output responses the cRIO sends to the
+response port (4999).  The socket is drained continuously on its own thread
+(selectors, epoll on Linux), every response is decoded by its cRIO port
+number (60-77) and kept in a latest value cache, so reading a DO is a dict
+lookup and a request can wait for the response of its own port instead of
+whichever datagram arrives next.
+
+Responses come in two forms, both handled by decodeResponse:
+    binary  [cRIO port number, value]      value is 0/1 or ascii '0'/'1'
+    text    "NNv"                          ascii port number followed by the value digit
+'''
+
+FIRST_PORT = 60
+LAST_PORT = 77
+
+# Output names by cRIO port number, as in DigitalOutputSimulator
+PORT_NAMES = {
+    60 : 'Heart Beat Safety Controller',
+    61 : 'Critical Fault Safety Controller',
+    62 : 'Mirror Lower Raising To Safety Controller',
+    63 : 'Mirror Parked To Safety Controller',
+    64 : 'Air Supply Control Valve',
+    65 : 'Mirror Cell Light Remote Control',
+    70 : 'Auxiliary Power Network A On',
+    71 : 'Auxiliary Power Network B On',
+    72 : 'Auxiliary Power Network C On',
+    73 : 'Auxiliary Power Network D On',
+    74 : 'Power Network A On',
+    75 : 'Power Network B On',
+    76 : 'Power Network C On',
+    77 : 'Power Network D On',
+    }
+
+# value, time.monotonic() of the last response and the number of responses received for the port
+DOState = namedtuple('DOState', 'port value timestamp count')
+
+_ZERO = ord('0')
+_ONE = ord('1')
+
+##########################################################################################################
+# (port, value) of a DO response, raises if the response is malformed or the port is not a DO
+def decodeResponse(message):
+    if len(message) == 2:
+        port = message[0]
+        value = message[1]
+    elif len(message) >= 3 and _ZERO <= message[0] <= ord('9') and _ZERO <= message[1] <= ord('9'):
+        port = (message[0] - _ZERO) * 10 + (message[1] - _ZERO)
+        value = message[2]
+    else:
+        raise Exception("Malformed DO response " + repr(bytes(message)))
+    if port < FIRST_PORT or port > LAST_PORT:
+        raise Exception("DO response for cRIO port " + str(port) + " which is not a digital output")
+    if value == _ZERO or value == 0:
+        return port, False
+    if value == _ONE or value == 1:
+        return port, True
+    raise Exception("DO response for cRIO port " + str(port) + " has the invalid value " + str(value))
+
+class DOListener:
+
+    # udp is the bound response UDP.UDP, its socket is switched to non blocking
+    def __init__(self, udp):
+        self.udp = udp
+        self.received = 0
+        self.malformed = 0
+        # callbacks that raised, the error is logged and the listener goes on
+        self.callbackErrors = 0
+        self.lastCallbackError = None
+        self._states = {}
+        self._callbacks = {}
+        self._condition = threading.Condition()
+        # notified on every response, for WaitUntil(..., notifier = listener.notifier)
+        self.notifier = Notifier()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self.udp.sock.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.udp.sock, selectors.EVENT_READ)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self._selector.close()
+
+    def _run(self):
+        sock = self.udp.sock
+        select = self._selector.select
+        while self._running:
+            if not select(0.1):
+                continue
+            while True:
+                try:
+                    message = sock.recv(1024)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError:
+                    if not self._running:
+                        return
+                    raise
+                self.handleResponse(message, time.monotonic())
+
+    ##########################################################################################################
+    # Update the cache with one response, callbacks of the port run on the listener thread when the value changes.
+    # A callback that raises is counted in callbackErrors and logged, the other callbacks still run.
+    def handleResponse(self, message, timestamp:float):
+        try:
+            port, value = decodeResponse(message)
+        except Exception:
+            self.malformed += 1
+            return
+        with self._condition:
+            previous = self._states.get(port)
+            self._states[port] = DOState(port, value, timestamp, previous.count + 1 if previous is not None else 1)
+            self.received += 1
+            self._condition.notify_all()
+        self.notifier.notify()
+        if previous is None or previous.value != value:
+            for callback in self._callbacks.get(port, ()) + self._callbacks.get(None, ()):
+                try:
+                    callback(port, value, timestamp)
+                except Exception as error:
+                    self.callbackErrors += 1
+                    self.lastCallbackError = repr(error)
+                    logger.log(Logger.WARNING, "DOListener: Callback for cRIO port %d raised %r", port, error)
+
+    ##########################################################################################################
+    # Call callback(port, value, timestamp) whenever the value of port changes, port None for every port
+    def addCallback(self, port, callback):
+        self._callbacks[port] = self._callbacks.get(port, ()) + (callback,)
+
+    def removeCallback(self, port, callback):
+        self._callbacks[port] = tuple(registered for registered in self._callbacks.get(port, ()) if registered is not callback)
+
+    # Latest value of port, None before the first response
+    def get(self, port:int):
+        state = self._states.get(port)
+        return state.value if state is not None else None
+
+    def getState(self, port:int):
+        return self._states.get(port)
+
+    def count(self, port:int):
+        state = self._states.get(port)
+        return state.count if state is not None else 0
+
+    def states(self):
+        return dict(self._states)
+
+    ##########################################################################################################
+    # Wait until port has received more than count responses, returns its state or None on timeout
+    def wait(self, port:int, count:int, timeout:float = 1.0):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                state = self._states.get(port)
+                if state is not None and state.count > count:
+                    return state
+                remaining = deadline - time.monotonic()
+                if remaining <= 0.0:
+                    return None
+                self._condition.wait(remaining)
+#end class DOListener
@@ -0,0 +1,133 @@
+import threading
+
+'''
+The state of the 11 digital inputs as one bitmap, bit n is input n of
+DigitalInputSimulator ([2, input number, 0 or 1]).  update() changes any
+number of inputs atomically and returns the frames of the inputs whose value
+actually changed, so a fault cascade goes out as one burst of just the
+transitions:
+
+    state = DigitalInputState()
+    frames = state.update({'gisEarthquakeSignal' : True, 'gisEStop' : True, 'airSupplyClosedAirReliefOpen' : True})
+    udp.sendFrames(frames)
+    udp.sendFrames(state.snapshot())    # resync, every input
+
+Inputs never sent are treated as changed, so the first update of an input is
+always sent, and invalidate() forgets what was sent.
+
+The bits are wire levels.  The inputs are active low, so the CellSimulator
+set* methods (setAirSupplyOff and so on) store the inverse of their logical
+argument, while setDigitalInputs passes the levels through as given.
+'''
+
+# Input numbers by DigitalInputSimulator method name
+INPUTS = {
+    'powerNetworkShutDown' : 0,
+    'fansHeatersPumpPoweredOff' : 1,
+    'laserTrackerOff' : 2,
+    'airSupplyClosedAirReliefOpen' : 3,
+    'gisEarthquakeSignal' : 4,
+    'gisEStop' : 5,
+    'tmaMotionStop' : 6,
+    'gisHeartbeatLost' : 7,
+    'airSupplyValveStatusOpen' : 8,
+    'airSupplyValveStatusClosed' : 9,
+    'mirrorCellLightsOn' : 10,
+    }
+INPUT_COUNT = len(INPUTS)
+ALL_INPUTS = (1 << INPUT_COUNT) - 1
+# FRAMES[input][value], the frames DigitalInputSimulator builds
+FRAMES = tuple((bytes([2, number, 0]), bytes([2, number, 1])) for number in range(INPUT_COUNT))
+
+##########################################################################################################
+# Input number of an input given by name or number
+def inputNumber(input):
+    if isinstance(input, str):
+        if input not in INPUTS:
+            raise Exception("There is no digital input named " + input + ", the inputs are " + ", ".join(INPUTS))
+        return INPUTS[input]
+    if not 0 <= input < INPUT_COUNT:
+        raise Exception("There are only " + str(INPUT_COUNT) + " digital inputs (0-" + str(INPUT_COUNT - 1) + "), you chose number: " + str(input))
+    return input
+
+# Frames of the inputs in the bitmap mask with their value in bits
+def _frames(bits:int, mask:int):
+    return [FRAMES[number][bits >> number & 1] for number in range(INPUT_COUNT) if mask >> number & 1]
+
+class DigitalInputState:
+
+    def __init__(self, bits:int = 0):
+        self.bits = bits & ALL_INPUTS
+        # inputs whose current value has been sent
+        self.sent = 0
+        self._lock = threading.Lock()
+
+    def get(self, input):
+        return bool(self.bits >> inputNumber(input) & 1)
+
+    ##########################################################################################################
+    # Set every input of changes ({name or number : bool}) at once, returns the frames of the inputs
+    # whose value changed (or was never sent) in input order.  With force every input of changes is
+    # returned.  Nothing is changed when an input is invalid.
+    def update(self, changes, force:bool = False):
+        mask = 0
+        values = 0
+        for input, value in changes.items():
+            number = inputNumber(input)
+            mask |= 1 << number
+            if value:
+                values |= 1 << number
+        with self._lock:
+            bits = (self.bits & ~mask) | values
+            changed = mask if force else ((bits ^ self.bits) | ~self.sent) & mask
+            self.bits = bits
+            self.sent |= mask
+            # from the local bits, a concurrent update must not change the values this update sends
+            return _frames(bits, changed)
+
+    def set(self, input, value:bool, force:bool = False):
+        return self.update({input : value}, force)
+
+    # Frames of every input, for a resync
+    def snapshot(self):
+        with self._lock:
+            self.sent = ALL_INPUTS
+            return _frames(self.bits, ALL_INPUTS)
+
+    # Frames of the inputs in the bitmap mask with their current value
+    def frames(self, mask:int):
+        with self._lock:
+            return _frames(self.bits, mask)
+
+    # Forget what was sent, the next update of every input is sent
+    def invalidate(self):
+        with self._lock:
+            self.sent = 0
+#end class DigitalInputState
+
+###############################################################################
+# main - for testing
+def main():
+    import DigitalInputSimulator
+    diSim = DigitalInputSimulator.DigitalInputSimulator()
+    for name, number in INPUTS.items():
+        assert(FRAMES[number][1] == getattr(diSim, name)(1))
+        assert(FRAMES[number][0] == getattr(diSim, name)(0))
+    state = DigitalInputState()
+    assert(state.update({'gisEStop' : False}) == [bytes([2, 5, 0])])
+    assert(state.update({'gisEStop' : False}) == [])
+    assert(state.update({'gisEStop' : False}, force = True) == [bytes([2, 5, 0])])
+    assert(state.update({'gisEarthquakeSignal' : True, 'gisEStop' : True, 3 : True}) == [bytes([2, 3, 1]), bytes([2, 4, 1]), bytes([2, 5, 1])])
+    assert(state.update({'gisEarthquakeSignal' : True, 'gisEStop' : False}) == [bytes([2, 5, 0])])
+    assert(state.get('gisEarthquakeSignal') and not state.get(5))
+    try:
+        state.update({'gisEStop' : True, 'noSuchInput' : True})
+        assert(False)
+    except Exception as error:
+        assert("noSuchInput" in str(error))
+    assert(not state.get('gisEStop'))
+    assert(len(state.snapshot()) == INPUT_COUNT and state.update({0 : False}) == [])
+    print("DigitalInputState: OK")
+
+###############################################################################
+#main()
@@ -1,65 +1,94 @@
 import binascii
 import struct
+import numpy as np
 from Simulator import Simulator
 
 '''
 This class simulates responses from the Inclinometer.  Returns a byte array 
 for each response possible.
 
+displacementResponses encodes a whole (N, 8) array of samples at once into
+an (N, RESPONSE_SIZE) buffer, byte for byte what displacementResponse returns
+for every row.
+
 AWC 6 October 2017
 '''
+
+DISPLACEMENT_LIMIT = 999.9999
+CHANNELS = 8
+# "M0," then 8 fields "+XXX.XXXX" separated by "," then "\r\n", after the length byte
+FIELD_WIDTH = 9
+FIELD_START = 4
+RESPONSE_SIZE = FIELD_START + CHANNELS * (FIELD_WIDTH + 1) + 1
+# Scaled values closer than this to a rounding tie are formatted by Python, which rounds the exact binary value
+TIE_TOLERANCE = 1e-6
+_DIGIT_POWERS = np.array([1000000, 100000, 10000, 1000, 100, 10, 1], dtype=np.int64)
+# field positions of the 7 digits, the sign is at 0 and the point at 4
+_DIGIT_POSITIONS = np.array([1, 2, 3, 5, 6, 7, 8])
+
 class DisplacementSimulator(Simulator):
 
     RESPONSE_BEGIN = "M0,"
     RESPONSE_END = "\r\n"
     DISPLACEMENT_FORMAT = "{num:+09.4f}"
+    RESPONSE_FORMAT = RESPONSE_BEGIN + ",".join(["%+09.4f"] * CHANNELS) + RESPONSE_END
     
     def __init__(self):
-        pass
+        template = bytearray([RESPONSE_SIZE - 1]) + (self.RESPONSE_FORMAT % ((0.0,) * CHANNELS)).encode('ascii')
+        self._template = np.frombuffer(bytes(template), dtype=np.uint8)
+        # buffer offset of every digit of every field, (8, 7)
+        self._digitColumns = FIELD_START + np.arange(CHANNELS)[:, None] * (FIELD_WIDTH + 1) + _DIGIT_POSITIONS
+        self._signColumns = FIELD_START + np.arange(CHANNELS) * (FIELD_WIDTH + 1)
 
     ###############################################################################
     # displacementResponse
     def displacementResponse(self, displace1, displace2, displace3, displace4, displace5, displace6, displace7, displace8):
-        if displace1 < -999.9999 or displace1 > 999.9999:
-            raise Exception("displace1 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace2 < -999.9999 or displace2 > 999.9999:
-            raise Exception("displace2 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace3 < -999.9999 or displace3 > 999.9999:
-            raise Exception("displace3 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace4 < -999.9999 or displace4 > 999.9999:
-            raise Exception("displace4 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace5 < -999.9999 or displace5 > 999.9999:
-            raise Exception("displace5 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace6 < -999.9999 or displace6 > 999.9999:
-            raise Exception("displace6 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace7 < -999.9999 or displace7 > 999.9999:
-            raise Exception("displace7 is outside the valid range of values [-999.9999, +999.9999]")
-        if displace8 < -999.9999 or displace8 > 999.9999:
-            raise Exception("displace8 is outside the valid range of values [-999.9999, +999.9999]")
-
-        displaceArray = [self.DISPLACEMENT_FORMAT.format(num=displace1),
-                         self.DISPLACEMENT_FORMAT.format(num=displace2),
-                         self.DISPLACEMENT_FORMAT.format(num=displace3),
-                         self.DISPLACEMENT_FORMAT.format(num=displace4),
-                         self.DISPLACEMENT_FORMAT.format(num=displace5),
-                         self.DISPLACEMENT_FORMAT.format(num=displace6),
-                         self.DISPLACEMENT_FORMAT.format(num=displace7),
-                         self.DISPLACEMENT_FORMAT.format(num=displace8)]
-        responseString = self.RESPONSE_BEGIN + ",".join(displaceArray) + self.RESPONSE_END
-        responseLength = len(responseString)
-        
-        response = bytearray()
-        self.dataCheck(responseString, 'Displacement Response', response, responseLength)
-        
-        response[:0] = bytes([len(response)])
-
+        displacements = (displace1, displace2, displace3, displace4, displace5, displace6, displace7, displace8)
+        for i, displacement in enumerate(displacements):
+            if displacement < -DISPLACEMENT_LIMIT or displacement > DISPLACEMENT_LIMIT:
+                raise Exception("displace" + str(i + 1) + " is outside the valid range of values [-999.9999, +999.9999]")
+        responseString = (self.RESPONSE_FORMAT % displacements).encode('ascii')
+        response = bytearray([len(responseString)])
+        response += responseString
         return response
 
+    ###############################################################################
+    # displacementResponses - the responses of every row of displacements (N, 8) as an (N, RESPONSE_SIZE)
+    # uint8 array, written into out when given
+    def displacementResponses(self, displacements, out = None):
+        displacements = np.asarray(displacements, dtype=np.float64).reshape(-1, CHANNELS)
+        outside = (displacements < -DISPLACEMENT_LIMIT) | (displacements > DISPLACEMENT_LIMIT)
+        if outside.any():
+            row, channel = np.argwhere(outside)[0]
+            raise Exception("displace" + str(channel + 1) + " of row " + str(row)
+                            + " is outside the valid range of values [-999.9999, +999.9999]")
+        if out is None:
+            out = np.empty((len(displacements), RESPONSE_SIZE), dtype=np.uint8)
+        elif out.shape != (len(displacements), RESPONSE_SIZE) or out.dtype != np.uint8:
+            raise Exception("out must be a uint8 array of shape " + str((len(displacements), RESPONSE_SIZE)))
+        out[:] = self._template
+        out[:, self._signColumns] = np.where(np.signbit(displacements), ord('-'), ord('+'))
+        scaled = np.abs(displacements) * 10000.0
+        fraction = scaled - np.floor(scaled)
+        # NaN is never close to a tie, it is caught with the non finite values
+        python = (np.abs(fraction - 0.5) < TIE_TOLERANCE) | ~np.isfinite(scaled)
+        units = np.floor(np.where(python, 0.0, scaled) + 0.5).astype(np.int64)
+        out[:, self._digitColumns] = (units[:, :, None] // _DIGIT_POWERS % 10 + ord('0')).astype(np.uint8)
+        for row, channel in np.argwhere(python):
+            start = self._signColumns[channel]
+            out[row, start:start + FIELD_WIDTH] = np.frombuffer(("%+09.4f" % displacements[row, channel]).encode('ascii'), dtype=np.uint8)
+        return out
+
 ###############################################################################
 # main - for testing
 def main():
     displaceSim = DisplacementSimulator()
 
+    samples = [[-19.7297, 4.8019, 6.0861, 4.2432, 5.0091, 5.3213, 2.0120, 11.0113], [-0.0, 0.00005, -999.9999, 999.9999, 0.12345, -1.5, 0.0, 12.34565]]
+    responses = displaceSim.displacementResponses(samples)
+    for row, sample in enumerate(samples):
+        assert(responses[row].tobytes() == bytes(displaceSim.displacementResponse(*sample)))
+
     response = displaceSim.displacementResponse(-19.7297, 4.8019, 6.0861, 4.2432, 5.0091, 5.3213, 2.0120, 11.0113)
     ordArray = [c for c in response]
     print(ordArray)
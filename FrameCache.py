@@ -0,0 +1,96 @@
+import struct
+from collections import OrderedDict
+
+'''
+Bounded LRU cache of finished frames.  Frames are keyed on the encoder key
+(the ILC function code, or a name for the other simulators) and the argument
+tuple, and stored as immutable bytes so one cached frame can be sent any
+number of times.  Encoders whose arguments rarely repeat (float telemetry)
+can be opted out with disable(), they are then always encoded directly.
+
+Float arguments are keyed by their IEEE bytes, not their value: -0.0 == 0.0
+but encodes differently, and every NaN would otherwise be a new entry.
+'''
+
+_DOUBLE = struct.Struct('>d')
+
+def _argumentKey(args):
+    return tuple(_DOUBLE.pack(arg) if isinstance(arg, float) else arg for arg in args)
+
+class FrameCache:
+
+    def __init__(self, maxSize:int = 4096):
+        if maxSize <= 0:
+            raise Exception("maxSize must be greater than 0, it is currently " + str(maxSize))
+        self.maxSize = maxSize
+        self._frames = OrderedDict()
+        self._disabled = set()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    ##########################################################################################################
+    # Return the frame encoder(*args) would produce, encoding it only on a cache miss
+    def encode(self, key, encoder, *args):
+        if key in self._disabled:
+            return encoder(*args)
+        cacheKey = (key, _argumentKey(args))
+        try:
+            frame = self._frames[cacheKey]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable arguments can not be cached
+            return encoder(*args)
+        else:
+            self._frames.move_to_end(cacheKey)
+            self.hits += 1
+            return frame
+        self.misses += 1
+        frame = bytes(encoder(*args))
+        self._frames[cacheKey] = frame
+        if len(self._frames) > self.maxSize:
+            self._frames.popitem(last=False)
+            self.evictions += 1
+        return frame
+
+    def disable(self, key):
+        self._disabled.add(key)
+        for cacheKey in [cacheKey for cacheKey in self._frames if cacheKey[0] == key]:
+            del self._frames[cacheKey]
+
+    def enable(self, key):
+        self._disabled.discard(key)
+
+    def clear(self):
+        self._frames.clear()
+
+    def resetStats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'size' : len(self._frames), 'maxSize' : self.maxSize, 'hits' : self.hits, 'misses' : self.misses,
+                'evictions' : self.evictions, 'hitRate' : self.hits / lookups if lookups else 0.0}
+
+    def __len__(self):
+        return len(self._frames)
+
+###############################################################################
+# main - for testing
+def main():
+    import ILCSimulator
+    ilcSim = ILCSimulator.ILCSimulator()
+    cache = FrameCache()
+    assert(cache.encode(74, ilcSim.readBoostValueDcaGains, 5, 0.0, 1.0) == bytes(ilcSim.readBoostValueDcaGains(5, 0.0, 1.0)))
+    assert(cache.encode(74, ilcSim.readBoostValueDcaGains, 5, -0.0, 1.0) == bytes(ilcSim.readBoostValueDcaGains(5, -0.0, 1.0)))
+    for i in range(50):
+        cache.encode(74, ilcSim.readBoostValueDcaGains, 5, float('nan'), 1.0)
+    assert(len(cache) == 3)
+    assert(cache.encode(74, ilcSim.readBoostValueDcaGains, 5, 0.0, 1.0) == bytes(ilcSim.readBoostValueDcaGains(5, 0.0, 1.0)))
+    print("FrameCache: OK")
+
+###############################################################################
+#main()
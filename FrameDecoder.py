@@ -0,0 +1,314 @@
+import struct
+from collections import namedtuple
+import numpy as np
+import CRC
+import ILCFrameCodec
+
+'''
+Decoders for every frame the simulators produce, the inverse of ILCSimulator,
+InclinometerSimulator, DisplacementSimulator, AccelSimulator and the DI/DO
+simulators.  Frames are read in place with struct.unpack_from from any buffer
+(bytes, bytearray, memoryview, NumPy array) starting at the frame's length
+byte, nothing is sliced or copied.  Every decoder returns a namedtuple record.
+
+decodeILCFrame dispatches on the function code, splitFrames walks a datagram
+of concatenated length prefixed frames and decodeILCColumns decodes such a
+buffer into NumPy columns in a handful of array operations:
+
+    columns = decodeILCColumns(datagram)
+    forces = columns.primaryForce[columns.function == 75]
+'''
+
+ReportServerId = namedtuple('ReportServerId', 'address uniqueId ilcAppType networkNodeType ilcSelectedOptions networkNodeOptions majorRev minorRev firmwareName')
+ReportServerStatus = namedtuple('ReportServerStatus', 'address mode status faults')
+IlcMode = namedtuple('IlcMode', 'address mode')
+StepMotorCommand = namedtuple('StepMotorCommand', 'address status ssiEncoderValue loadCellForce')
+ForceAndStatusRequest = namedtuple('ForceAndStatusRequest', 'address status ssiEncoderValue loadCellForce')
+SetIlcTemporaryAddress = namedtuple('SetIlcTemporaryAddress', 'address temporaryAddress')
+SetBoostValveDcaGains = namedtuple('SetBoostValveDcaGains', 'address')
+ReadBoostValveDcaGains = namedtuple('ReadBoostValveDcaGains', 'address axialBoostValveGain lateralBoostValveGain')
+PneumaticAxisForce = namedtuple('PneumaticAxisForce', 'address status primaryForce secondaryForce')
+PneumaticForceAndStatus = namedtuple('PneumaticForceAndStatus', 'address status primaryForce secondaryForce')
+SetAdcSampleRate = namedtuple('SetAdcSampleRate', 'address scanRateCode')
+SetAdcChannelOffsetAndSensitivity = namedtuple('SetAdcChannelOffsetAndSensitivity', 'address')
+ReadDacValues = namedtuple('ReadDacValues', 'address dac1ValueAxialPush dac2ValueAxialPush dac3ValueLateralPush dac4ValueLateralPush')
+Reset = namedtuple('Reset', 'address')
+ReadCalibrationData = namedtuple('ReadCalibrationData', 'address values')
+ReadDcaPressureValues = namedtuple('ReadDcaPressureValues', 'address pressure1AxialPush pressure2AxialPull pressure3LateralPull pressure4LateralPush')
+ReportDcaId = namedtuple('ReportDcaId', 'address dcaUniqueId firmwareType firmwareVersion')
+ReportDcaStatus = namedtuple('ReportDcaStatus', 'address dcaStatus')
+ReadLVDT = namedtuple('ReadLVDT', 'address lvdt1 lvdt2')
+
+Inclinometer = namedtuple('Inclinometer', 'address function degreesMeasured crcValid')
+Displacement = namedtuple('Displacement', 'displacements')
+Accelerometer = namedtuple('Accelerometer', 'accelerometerNumber elevationVoltage azimuthVoltage')
+DigitalInput = namedtuple('DigitalInput', 'inputNumber command')
+DigitalOutput = namedtuple('DigitalOutput', 'cRioPort')
+
+# Columns of decodeILCColumns, one entry per frame.  Fields a function code does not have are 0 (NaN for floats):
+# status for 66, 67, 75 and 76, ssiEncoderValue for 66 and 67, primaryForce for 66, 67 (load cell force),
+# 75 and 76, secondaryForce for the dual 75 and 76 frames
+ILCColumns = namedtuple('ILCColumns', 'offset length address function byteCount status ssiEncoderValue primaryForce secondaryForce')
+
+_HEADER = struct.Struct('>BBBB')
+
+def _header(buffer, offset:int, functionCode:int):
+    length, address, function, byteCount = _HEADER.unpack_from(buffer, offset)
+    if function != functionCode:
+        raise Exception("Expected function code " + str(functionCode) + " but the frame has function code " + str(function))
+    return length, address, byteCount
+
+##########################################################################################################
+# Code 17(0x11) Report Server Id
+def decodeReportServerId(buffer, offset:int = 0):
+    length, address, byteCount = _header(buffer, offset, 17)
+    layout = ILCFrameCodec.reportServerIdLayout(byteCount - 13)
+    values = layout.struct.unpack_from(buffer, offset)
+    return ReportServerId(address, values[5], *values[6:12], values[12].decode('ascii'))
+
+##########################################################################################################
+# Build the decoder of a fixed layout, the record gets the address followed by the payload values
+def _layoutDecoder(layout:ILCFrameCodec.FrameLayout, record):
+    unpack = layout.struct.unpack_from
+    functionCode = layout.functionCode
+    def decode(buffer, offset:int = 0):
+        values = unpack(buffer, offset)
+        if values[2] != functionCode:
+            raise Exception("Expected function code " + str(functionCode) + " but the frame has function code " + str(values[2]))
+        return record(values[1], *values[4:])
+    return decode
+
+decodeReportServerStatus = _layoutDecoder(ILCFrameCodec.REPORT_SERVER_STATUS, ReportServerStatus)
+decodeIlcMode = _layoutDecoder(ILCFrameCodec.ILC_MODE, IlcMode)
+decodeStepMotorCommand = _layoutDecoder(ILCFrameCodec.STEP_MOTOR_COMMAND, StepMotorCommand)
+decodeForceAndStatusRequest = _layoutDecoder(ILCFrameCodec.FORCE_AND_STATUS_REQUEST, ForceAndStatusRequest)
+decodeSetIlcTemporaryAddress = _layoutDecoder(ILCFrameCodec.SET_ILC_TEMPORARY_ADDRESS, SetIlcTemporaryAddress)
+decodeSetBoostValveDcaGains = _layoutDecoder(ILCFrameCodec.SET_BOOST_VALVE_DCA_GAINS, SetBoostValveDcaGains)
+decodeReadBoostValveDcaGains = _layoutDecoder(ILCFrameCodec.READ_BOOST_VALVE_DCA_GAINS, ReadBoostValveDcaGains)
+decodeSetAdcSampleRate = _layoutDecoder(ILCFrameCodec.SET_ADC_SAMPLE_RATE, SetAdcSampleRate)
+decodeSetAdcChannelOffsetAndSensitivity = _layoutDecoder(ILCFrameCodec.SET_ADC_CHANNEL_OFFSET_AND_SENSITIVITY, SetAdcChannelOffsetAndSensitivity)
+decodeReadDacValues = _layoutDecoder(ILCFrameCodec.READ_DAC_VALUES, ReadDacValues)
+decodeReset = _layoutDecoder(ILCFrameCodec.RESET, Reset)
+decodeReadDcaPressureValues = _layoutDecoder(ILCFrameCodec.READ_DCA_PRESSURE_VALUES, ReadDcaPressureValues)
+decodeReportDcaStatus = _layoutDecoder(ILCFrameCodec.REPORT_DCA_STATUS, ReportDcaStatus)
+decodeReadLVDT = _layoutDecoder(ILCFrameCodec.READ_LVDT, ReadLVDT)
+
+##########################################################################################################
+# Code 75(0x4B) Pneumatic Axis Force Demand, secondaryForce is None for a single axis frame
+def decodePneumaticAxisForce(buffer, offset:int = 0):
+    return _decodePneumatic(buffer, offset, 75, ILCFrameCodec.SINGLE_PNEUMATIC_AXIS_FORCE,
+                            ILCFrameCodec.DUAL_PNEUMATIC_AXIS_FORCE, PneumaticAxisForce)
+
+##########################################################################################################
+# Code 76(0x4C) Pneumatic Force and Status, secondaryForce is None for a single axis frame
+def decodePneumaticForceAndStatus(buffer, offset:int = 0):
+    return _decodePneumatic(buffer, offset, 76, ILCFrameCodec.SINGLE_PNEUMATIC_FORCE_AND_STATUS,
+                            ILCFrameCodec.DUAL_PNEUMATIC_FORCE_AND_STATUS, PneumaticForceAndStatus)
+
+def _decodePneumatic(buffer, offset:int, functionCode:int, single:ILCFrameCodec.FrameLayout, dual:ILCFrameCodec.FrameLayout, record):
+    length, address, byteCount = _header(buffer, offset, functionCode)
+    if byteCount == dual.payloadLength:
+        values = dual.struct.unpack_from(buffer, offset)
+        return record(address, values[4], values[5], values[6])
+    values = single.struct.unpack_from(buffer, offset)
+    return record(address, values[4], values[5], None)
+
+##########################################################################################################
+# Code 110(0x6E) Read Calibration Data, values holds the 24 calibration floats in frame order
+def decodeReadCalibrationData(buffer, offset:int = 0):
+    values = ILCFrameCodec.READ_CALIBRATION_DATA.struct.unpack_from(buffer, offset)
+    if values[2] != 110:
+        raise Exception("Expected function code 110 but the frame has function code " + str(values[2]))
+    return ReadCalibrationData(values[1], values[4:])
+
+##########################################################################################################
+# Code 120(0x78) Report DCA ID, the unique id is returned as the 6 raw bytes
+def decodeReportDcaId(buffer, offset:int = 0):
+    values = ILCFrameCodec.REPORT_DCA_ID.struct.unpack_from(buffer, offset)
+    if values[2] != 120:
+        raise Exception("Expected function code 120 but the frame has function code " + str(values[2]))
+    return ReportDcaId(values[1], values[4], values[5], values[6])
+
+ilcDecoders = {
+    17 : decodeReportServerId,
+    18 : decodeReportServerStatus,
+    65 : decodeIlcMode,
+    66 : decodeStepMotorCommand,
+    67 : decodeForceAndStatusRequest,
+    72 : decodeSetIlcTemporaryAddress,
+    73 : decodeSetBoostValveDcaGains,
+    74 : decodeReadBoostValveDcaGains,
+    75 : decodePneumaticAxisForce,
+    76 : decodePneumaticForceAndStatus,
+    80 : decodeSetAdcSampleRate,
+    81 : decodeSetAdcChannelOffsetAndSensitivity,
+    82 : decodeReadDacValues,
+    107 : decodeReset,
+    110 : decodeReadCalibrationData,
+    119 : decodeReadDcaPressureValues,
+    120 : decodeReportDcaId,
+    121 : decodeReportDcaStatus,
+    122 : decodeReadLVDT,
+    }
+
+##########################################################################################################
+# Decode the ILC frame starting at offset, whatever its function code
+def decodeILCFrame(buffer, offset:int = 0):
+    function = buffer[offset + 2]
+    decoder = ilcDecoders.get(function)
+    if decoder is None:
+        raise Exception("There is no decoder for function code " + str(function))
+    return decoder(buffer, offset)
+
+##########################################################################################################
+# Inclinometer response, the millidegrees are sent with their two 16 bit words swapped
+def decodeInclinometer(buffer, offset:int = 0):
+    length, address, function, byteCount = _HEADER.unpack_from(buffer, offset)
+    low, high = struct.unpack_from('>HH', buffer, offset + 4)
+    crcValid = CRC.calculateCRC(memoryview(buffer)[offset + 1 : offset + 1 + length]) == 0
+    return Inclinometer(address, function, ((high << 16) | low) / 1000.0, crcValid)
+
+##########################################################################################################
+# Displacement response, "M0,<8 signed values>\r\n" in ascii
+def decodeDisplacement(buffer, offset:int = 0):
+    length = buffer[offset]
+    text = bytes(memoryview(buffer)[offset + 1 : offset + 1 + length]).decode('ascii')
+    if not text.startswith('M0,') or not text.endswith('\r\n'):
+        raise Exception("The displacement response is malformed: " + repr(text))
+    return Displacement(tuple(float(value) for value in text[3:-2].split(',')))
+
+_ACCELEROMETER = struct.Struct('>Bbff')
+
+##########################################################################################################
+# Accelerometer response, [length, accelerometer number, elevation voltage, azimuth voltage]
+def decodeAccelerometer(buffer, offset:int = 0):
+    length, number, elevation, azimuth = _ACCELEROMETER.unpack_from(buffer, offset)
+    return Accelerometer(number, elevation, azimuth)
+
+_DIGITAL_INPUT = struct.Struct('>Bbb')
+
+##########################################################################################################
+# Digital input command, [length, input number, command]
+def decodeDigitalInput(buffer, offset:int = 0):
+    length, number, command = _DIGITAL_INPUT.unpack_from(buffer, offset)
+    return DigitalInput(number, command)
+
+##########################################################################################################
+# Digital output request, [length, cRIO port number]
+def decodeDigitalOutput(buffer, offset:int = 0):
+    return DigitalOutput(struct.unpack_from('>Bb', buffer, offset)[1])
+
+##########################################################################################################
+# Offsets of the length prefixed frames in buffer.  Raises if the last frame runs past the end of the buffer.
+def splitFrames(buffer):
+    if not isinstance(buffer, (bytes, bytearray)):
+        buffer = memoryview(buffer).cast('B')
+    offsets = []
+    append = offsets.append
+    offset = 0
+    end = len(buffer)
+    while offset < end:
+        append(offset)
+        offset += buffer[offset] + 1
+    if offset != end:
+        raise Exception("The last frame at offset " + str(offsets[-1]) + " runs " + str(offset - end) + " bytes past the end of the buffer")
+    return offsets
+
+# Bytes start to start + width of the frames at index as an (N, width) array, only the gathered bytes are copied
+def _gatherBytes(data, index, start:int, width:int):
+    return data[index[:, None] + np.arange(start, start + width)]
+
+##########################################################################################################
+# Decode a buffer of concatenated ILC frames into ILCColumns (NumPy arrays, one entry per frame)
+def decodeILCColumns(buffer, offsets = None):
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if offsets is None:
+        offsets = splitFrames(buffer)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    count = len(offsets)
+    length = data[offsets]
+    address = data[offsets + 1]
+    function = data[offsets + 2]
+    byteCount = data[offsets + 3]
+
+    status = np.zeros(count, dtype=np.int16)
+    ssiEncoderValue = np.zeros(count, dtype=np.int32)
+    primaryForce = np.full(count, np.nan, dtype=np.float32)
+    secondaryForce = np.full(count, np.nan, dtype=np.float32)
+
+    pneumatic = (function == 75) | (function == 76)
+    motor = (function == 66) | (function == 67)
+    withStatus = pneumatic | motor
+    dual = pneumatic & (byteCount == ILCFrameCodec.DUAL_PNEUMATIC_AXIS_FORCE.payloadLength)
+
+    # every field is read from within its own frame, a frame too short for its fields raises like decodeILCFrame
+    needed = np.where(motor, ILCFrameCodec.FORCE_AND_STATUS_REQUEST.frameLength,
+                      np.where(dual, ILCFrameCodec.DUAL_PNEUMATIC_AXIS_FORCE.frameLength,
+                               np.where(pneumatic, ILCFrameCodec.SINGLE_PNEUMATIC_AXIS_FORCE.frameLength, 0)))
+    short = (needed > length.astype(np.int64) + 1) | (offsets + length + 1 > len(data))
+    if short.any():
+        first = int(np.flatnonzero(short)[0])
+        raise Exception("The ILC frame at offset " + str(int(offsets[first])) + " (function " + str(int(function[first]))
+                        + ", length " + str(int(length[first])) + ") is too short for its fields or runs past the end of the buffer")
+
+    rawStatus = _gatherBytes(data, offsets[withStatus], 4, 1)[:, 0]
+    # 76 has an unsigned status byte, the others are signed
+    status[withStatus] = np.where(function[withStatus] == 76, rawStatus, rawStatus.view(np.int8))
+
+    index = offsets[pneumatic]
+    primaryForce[pneumatic] = _gatherBytes(data, index, 5, 4).view('>f4')[:, 0]
+    index = offsets[dual]
+    secondaryForce[dual] = _gatherBytes(data, index, 9, 4).view('>f4')[:, 0]
+
+    index = offsets[motor]
+    ssiEncoderValue[motor] = _gatherBytes(data, index, 5, 4).view('>i4')[:, 0]
+    primaryForce[motor] = _gatherBytes(data, index, 9, 4).view('>f4')[:, 0]
+    return ILCColumns(offsets, length, address, function, byteCount, status, ssiEncoderValue, primaryForce, secondaryForce)
+
+###############################################################################
+# main - for testing
+def main():
+    import ILCSimulator
+    import InclinometerSimulator
+    import DisplaceSimulator
+    import AccelSimulator
+    import DigitalInputSimulator
+    import DigitalOutputSimulator
+    ilcSim = ILCSimulator.ILCSimulator()
+
+    assert(decodeReportServerId(ilcSim.reportServerId(1, 'ABCDEF', 1, 4, 1, 2, 1, 0, 'Firmware Name'))
+           == ReportServerId(1, b'ABCDEF', 1, 4, 1, 2, 1, 0, 'Firmware Name'))
+    assert(decodeILCFrame(ilcSim.reportServerStatus(1, 2, 512, 256)) == ReportServerStatus(1, 2, 512, 256))
+    assert(decodeILCFrame(ilcSim.stepMotorCommand(1, 0, 4096, 3.5)) == StepMotorCommand(1, 0, 4096, 3.5))
+    assert(decodeILCFrame(ilcSim.singlePneumaticAxisForce(-3, 12, 123.5)) == PneumaticAxisForce(12, -3, 123.5, None))
+    assert(decodeILCFrame(ilcSim.dualPneumaticForceAndStatus(17, 200, 1.5, -2.5)) == PneumaticForceAndStatus(17, 200, 1.5, -2.5))
+    assert(decodeILCFrame(ilcSim.readCalibrationData(1, *[float(i) for i in range(24)])).values == tuple(float(i) for i in range(24)))
+    assert(decodeILCFrame(ilcSim.reportDcaId(1, 'ABCDEF', 2, 300)) == ReportDcaId(1, b'ABCDEF', 2, 300))
+
+    assert(decodeInclinometer(InclinometerSimulator.InclinometerSimulator().inclinometerResponse(36.001)) == Inclinometer(127, 3, 36.001, True))
+    values = (-19.7297, 4.8019, 6.0861, 4.2432, 5.0091, 5.3213, 2.0120, 11.0113)
+    assert(decodeDisplacement(DisplaceSimulator.DisplacementSimulator().displacementResponse(*values)).displacements == values)
+    assert(decodeAccelerometer(AccelSimulator.AccelSimulator().accelerometerResponse(2, 1.5, -0.25)) == Accelerometer(2, 1.5, -0.25))
+    assert(decodeDigitalInput(DigitalInputSimulator.DigitalInputSimulator().laserTrackerOff(1)) == DigitalInput(2, 1))
+    assert(decodeDigitalOutput(DigitalOutputSimulator.DigitalOutputSimulator().requestHeartBeatSafetyController()) == DigitalOutput(60))
+
+    frames = [ilcSim.singlePneumaticAxisForce(1, 12, 10.5), ilcSim.dualPneumaticAxisForce(17, -2, 20.5, 30.5),
+              ilcSim.forceAndStatusRequest(1, 3, -4096, 7.25), ilcSim.reset(5)]
+    columns = decodeILCColumns(b''.join(frames))
+    assert(list(columns.address) == [12, 17, 1, 5])
+    assert(list(columns.function) == [75, 75, 67, 107])
+    assert(list(columns.status) == [1, -2, 3, 0])
+    assert(list(columns.ssiEncoderValue) == [0, 0, -4096, 0])
+    assert(list(columns.primaryForce[:3]) == [10.5, 20.5, 7.25] and np.isnan(columns.primaryForce[3]))
+    assert(columns.secondaryForce[1] == 30.5 and np.isnan(columns.secondaryForce[0]))
+    # a truncated frame raises instead of reading the bytes of the next frame
+    for buffer in (bytes([4, 3, 75, 5, 1]) + bytes(frames[0]), b''.join(frames[:2]) + bytes([4, 18, 67, 9, 7])):
+        try:
+            decodeILCColumns(buffer)
+            assert(False)
+        except Exception as error:
+            assert("too short" in str(error))
+    print("FrameDecoder tests passed")
+
+###############################################################################
+#main()
@@ -0,0 +1,111 @@
+import numpy as np
+import ILCRoutingIndex
+import ActuatorColumns
+
+'''
+Vectorized encoding of the force actuator Pneumatic Axis Force Demand (75) and
+Pneumatic Force and Status (76) frames for many actuators at once.  The frames
+are byte identical to ILCSimulator.single*/dual* but are written with NumPy
+structured arrays (big endian floats) into one buffer, grouped by subnet, so a
+whole mirror update is a handful of array operations.
+
+Single axis actuators (SAA) produce 75 and 76 single frames,
+dual axis actuators (DAA) produce 75 and 76 dual frames.
+
+The status byte is packed signed in 75 and unsigned in 76, as ILCFrameCodec
+does, so both frames take it in the range both accept, [0, 127].
+'''
+
+# 75 + 76 frames of a single axis actuator, each [length, address, function, byte count, status, force]
+SINGLE_FRAMES = np.dtype([('axisHeader', 'u1', 4), ('axisStatus', 'i1'), ('axisForce', '>f4'),
+                          ('statusHeader', 'u1', 4), ('statusStatus', 'u1'), ('statusForce', '>f4')])
+
+# 75 + 76 frames of a dual axis actuator, each [length, address, function, byte count, status, primary, secondary]
+DUAL_FRAMES = np.dtype([('axisHeader', 'u1', 4), ('axisStatus', 'i1'), ('axisPrimaryForce', '>f4'), ('axisSecondaryForce', '>f4'),
+                        ('statusHeader', 'u1', 4), ('statusStatus', 'u1'), ('statusPrimaryForce', '>f4'), ('statusSecondaryForce', '>f4')])
+
+FLOAT32_MAX = float(np.finfo(np.float32).max)
+# Range of the status byte in both 75 ('b') and 76 ('B')
+STATUS_MIN = 0
+STATUS_MAX = 127
+
+class ForceAndStatusBatchEncoder:
+
+    def __init__(self, routingIndex:ILCRoutingIndex.ILCRoutingIndex = None):
+        if routingIndex is None:
+            routingIndex = ILCRoutingIndex.ILCRoutingIndex()
+        self.columns = ActuatorColumns.forceActuators
+        self.ids = self.columns.ids
+        self.subnets = self.columns.subnets
+        self.addresses = self.columns.addresses
+        self.single = self.columns.saaMask
+        self.frameLengths = np.where(self.single, SINGLE_FRAMES.itemsize, DUAL_FRAMES.itemsize)
+
+        # Headers never change for an actuator, take them from the routing index
+        routes = [routingIndex.route(int(id)) for id in self.ids]
+        self._axisHeaders = np.array([list(route.headers[75]) for route in routes], dtype=np.uint8)
+        self._statusHeaders = np.array([list(route.headers[76]) for route in routes], dtype=np.uint8)
+        self._singleOffsets = np.arange(SINGLE_FRAMES.itemsize)
+        self._dualOffsets = np.arange(DUAL_FRAMES.itemsize)
+
+    ##########################################################################################################
+    # Encode the 75 and 76 frames of every actuator in ids.  statusBytes, primaryForces and secondaryForces
+    # are arrays matching ids (or scalars), secondaryForces is ignored for single axis actuators.
+    # Returns the frame buffer (uint8 array) and a list of (subnet, start, end) slices, one per subnet.
+    def encode(self, ids, statusBytes, primaryForces, secondaryForces = 0.0):
+        rows = self.columns.rowsForIds(ids)
+        count = len(rows)
+        if count == 0:
+            return np.empty(0, dtype=np.uint8), []
+        statusBytes = np.broadcast_to(np.asarray(statusBytes), (count,))
+        primaryForces = np.broadcast_to(np.asarray(primaryForces, dtype=np.float64), (count,))
+        secondaryForces = np.broadcast_to(np.asarray(secondaryForces, dtype=np.float64), (count,))
+        if statusBytes.min() < STATUS_MIN or statusBytes.max() > STATUS_MAX:
+            raise Exception("Status Byte must be in the range [" + str(STATUS_MIN) + ", " + str(STATUS_MAX) + "]")
+        for forces, parameterName in ((primaryForces, 'Primary Cylinder Force'), (secondaryForces, 'Secondary Cylinder Force')):
+            if (np.abs(forces[np.isfinite(forces)]) > FLOAT32_MAX).any():
+                raise Exception(parameterName + " is too large to be packed as a 4 byte float")
+
+        # Group by subnet, keeping the caller's order within a subnet
+        order = np.argsort(self.subnets[rows], kind='stable')
+        rows = rows[order]
+        statusBytes = statusBytes[order]
+        primaryForces = primaryForces[order]
+        secondaryForces = secondaryForces[order]
+
+        lengths = self.frameLengths[rows]
+        ends = np.cumsum(lengths)
+        starts = ends - lengths
+        buffer = np.empty(int(ends[-1]), dtype=np.uint8)
+
+        single = self.single[rows]
+        if single.any():
+            singleRows = rows[single]
+            frames = np.empty(len(singleRows), dtype=SINGLE_FRAMES)
+            frames['axisHeader'] = self._axisHeaders[singleRows]
+            frames['axisStatus'] = statusBytes[single]
+            frames['axisForce'] = primaryForces[single]
+            frames['statusHeader'] = self._statusHeaders[singleRows]
+            frames['statusStatus'] = statusBytes[single]
+            frames['statusForce'] = primaryForces[single]
+            buffer[starts[single][:, None] + self._singleOffsets] = frames.view(np.uint8).reshape(-1, SINGLE_FRAMES.itemsize)
+        dual = ~single
+        if dual.any():
+            dualRows = rows[dual]
+            frames = np.empty(len(dualRows), dtype=DUAL_FRAMES)
+            frames['axisHeader'] = self._axisHeaders[dualRows]
+            frames['axisStatus'] = statusBytes[dual]
+            frames['axisPrimaryForce'] = primaryForces[dual]
+            frames['axisSecondaryForce'] = secondaryForces[dual]
+            frames['statusHeader'] = self._statusHeaders[dualRows]
+            frames['statusStatus'] = statusBytes[dual]
+            frames['statusPrimaryForce'] = primaryForces[dual]
+            frames['statusSecondaryForce'] = secondaryForces[dual]
+            buffer[starts[dual][:, None] + self._dualOffsets] = frames.view(np.uint8).reshape(-1, DUAL_FRAMES.itemsize)
+
+        subnets = self.subnets[rows]
+        boundaries = np.flatnonzero(subnets[1:] != subnets[:-1]) + 1
+        groupStarts = np.concatenate(([0], boundaries))
+        groupEnds = np.concatenate((boundaries, [count]))
+        slices = [(int(subnets[first]), int(starts[first]), int(ends[last - 1])) for first, last in zip(groupStarts, groupEnds)]
+        return buffer, slices
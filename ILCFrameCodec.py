@@ -0,0 +1,106 @@
+import struct
+
+'''
+Precompiled frame layouts for the ILC responses.  Every frame is
+    [frame length][address][function code][byte count][payload ...]
+where frame length counts every byte after itself (for UDP completeness) and
+byte count is the payload length (for the FPGA).  Each layout compiles the
+header and payload into a single big endian struct.Struct so a frame is
+written with one pack_into call into a preallocated buffer.
+
+Integer fields keep the widths and signedness ILCSimulator always used, 4 byte
+fields documented as floats are packed as IEEE 754 single precision.
+'''
+
+HEADER_LENGTH = 4
+
+class FrameLayout:
+
+    def __init__(self, functionCode:int, payloadFormat:str):
+        self.functionCode = functionCode
+        self.payloadFormat = payloadFormat
+        self.payloadLength = struct.calcsize('>' + payloadFormat)
+        self.frameLength = HEADER_LENGTH + self.payloadLength
+        self.struct = struct.Struct('>BBBB' + payloadFormat)
+
+    ##########################################################################################################
+    # Encode a frame into a new buffer
+    def encode(self, address:int, *values):
+        frame = bytearray(self.frameLength)
+        self.struct.pack_into(frame, 0, self.frameLength - 1, address, self.functionCode, self.payloadLength, *values)
+        return frame
+
+    ##########################################################################################################
+    # Encode a frame into buffer at offset, returns the offset following the frame
+    def encodeInto(self, buffer, offset:int, address:int, *values):
+        self.struct.pack_into(buffer, offset, self.frameLength - 1, address, self.functionCode, self.payloadLength, *values)
+        return offset + self.frameLength
+
+# Code 17(0x11) Report Server Id has a variable length firmware name, see reportServerIdLayout
+REPORT_SERVER_STATUS = FrameLayout(18, 'bhh')
+ILC_MODE = FrameLayout(65, 'h')
+STEP_MOTOR_COMMAND = FrameLayout(66, 'bif')
+FORCE_AND_STATUS_REQUEST = FrameLayout(67, 'bif')
+SET_ILC_TEMPORARY_ADDRESS = FrameLayout(72, 'b')
+SET_BOOST_VALVE_DCA_GAINS = FrameLayout(73, '')
+READ_BOOST_VALVE_DCA_GAINS = FrameLayout(74, 'ff')
+SINGLE_PNEUMATIC_AXIS_FORCE = FrameLayout(75, 'bf')
+DUAL_PNEUMATIC_AXIS_FORCE = FrameLayout(75, 'bff')
+SINGLE_PNEUMATIC_FORCE_AND_STATUS = FrameLayout(76, 'Bf')
+DUAL_PNEUMATIC_FORCE_AND_STATUS = FrameLayout(76, 'Bff')
+SET_ADC_SAMPLE_RATE = FrameLayout(80, 'h')
+SET_ADC_CHANNEL_OFFSET_AND_SENSITIVITY = FrameLayout(81, '')
+READ_DAC_VALUES = FrameLayout(82, 'hhhh')
+RESET = FrameLayout(107, '')
+READ_CALIBRATION_DATA = FrameLayout(110, '24f')
+READ_DCA_PRESSURE_VALUES = FrameLayout(119, '4f')
+REPORT_DCA_ID = FrameLayout(120, '6sbh')
+REPORT_DCA_STATUS = FrameLayout(121, 'h')
+READ_LVDT = FrameLayout(122, 'ff')
+
+# Fixed layouts by function code, 75 and 76 have a single (SAA) and dual (DAA) variant
+layoutsByFunctionCode = {
+    18 : (REPORT_SERVER_STATUS,),
+    65 : (ILC_MODE,),
+    66 : (STEP_MOTOR_COMMAND,),
+    67 : (FORCE_AND_STATUS_REQUEST,),
+    72 : (SET_ILC_TEMPORARY_ADDRESS,),
+    73 : (SET_BOOST_VALVE_DCA_GAINS,),
+    74 : (READ_BOOST_VALVE_DCA_GAINS,),
+    75 : (SINGLE_PNEUMATIC_AXIS_FORCE, DUAL_PNEUMATIC_AXIS_FORCE),
+    76 : (SINGLE_PNEUMATIC_FORCE_AND_STATUS, DUAL_PNEUMATIC_FORCE_AND_STATUS),
+    80 : (SET_ADC_SAMPLE_RATE,),
+    81 : (SET_ADC_CHANNEL_OFFSET_AND_SENSITIVITY,),
+    82 : (READ_DAC_VALUES,),
+    107 : (RESET,),
+    110 : (READ_CALIBRATION_DATA,),
+    119 : (READ_DCA_PRESSURE_VALUES,),
+    120 : (REPORT_DCA_ID,),
+    121 : (REPORT_DCA_STATUS,),
+    122 : (READ_LVDT,),
+    }
+
+_reportServerIdLayouts = {}
+
+##########################################################################################################
+# Code 17(0x11) Report Server Id layout for a firmware name of nameLength bytes.
+# The payload starts with its own byte count: uniqueId (6 bytes), ilcAppType, networkNodeType,
+# ilcSelectedOptions, networkNodeOptions, majorRev, minorRev (1 byte each) and the firmware name.
+def reportServerIdLayout(nameLength:int):
+    layout = _reportServerIdLayouts.get(nameLength)
+    if layout is None:
+        layout = FrameLayout(17, 'b6s6b%ds' % nameLength)
+        _reportServerIdLayouts[nameLength] = layout
+    return layout
+
+##########################################################################################################
+# Unique ids may be given as an integer or as a string of at most byteSize ascii characters
+def uniqueIdBytes(uniqueId, parameterName:str, byteSize:int = 6):
+    if isinstance(uniqueId, int):
+        return uniqueId.to_bytes(byteSize, byteorder='big', signed=True)
+    if isinstance(uniqueId, str):
+        if len(uniqueId) > byteSize:
+            raise Exception(parameterName + " is too large: " + str(len(uniqueId))
+                            + ", it can only be a maximum of " + str(byteSize))
+        return uniqueId.encode('ascii')
+    raise Exception(parameterName + " has a type that we are unable to process.  Throwing exception")
@@ -0,0 +1,82 @@
+import ILCFrameCodec
+from ForceActuatorTable import *
+from HardpointActuatorTable import *
+from HardpointMonitorTable import *
+
+'''
+Routing index for the ILCs, built once from the hardpoint actuator, hardpoint
+monitor and force actuator tables.  Maps an ILC id to its subnet, Modbus
+address, kind and table row, and (subnet, address) back to the ILC id for
+decoding traffic.  Each route also holds the 4 byte frame headers
+[frame length, address, function code, byte count] of the fixed length
+responses that ILC sends.
+'''
+
+HARDPOINT_ACTUATOR = 'HP'
+HARDPOINT_MONITOR = 'HM'
+SINGLE_AXIS_ACTUATOR = 'SAA'
+DUAL_AXIS_ACTUATOR = 'DAA'
+
+class ILCRoute:
+    __slots__ = ('id', 'kind', 'subnetNumber', 'subnet', 'address', 'row', 'headers')
+
+    def __init__(self, id:int, kind:str, subnetNumber:int, address:int, row:int, subnet = None):
+        self.id = id
+        self.kind = kind
+        self.subnetNumber = subnetNumber
+        self.subnet = subnet
+        self.address = address
+        self.row = row
+        self.headers = {}
+        for functionCode, layouts in ILCFrameCodec.layoutsByFunctionCode.items():
+            # 75 and 76 have a single and a dual axis variant
+            layout = layouts[-1] if kind == DUAL_AXIS_ACTUATOR else layouts[0]
+            self.headers[functionCode] = bytes([layout.frameLength - 1, address, functionCode, layout.payloadLength])
+
+class ILCRoutingIndex:
+
+    # getSubnet converts a subnet number (1-5) to the object frames are sent through
+    def __init__(self, getSubnet = None):
+        self._routes = {}
+        self._idsBySubnetAndAddress = {}
+        for row in hardpointActuatorTable:
+            self._addRoute(row[hardpointActuatorTableIDIndex], HARDPOINT_ACTUATOR, row[hardpointActuatorTableSubnetIndex],
+                           row[hardpointActuatorTableAddressIndex], row[hardpointActuatorTableIndexIndex], getSubnet)
+        for row in hardpointMonitorTable:
+            self._addRoute(row[hardpointMonitorTableIDIndex], HARDPOINT_MONITOR, row[hardpointMonitorTableSubnetIndex],
+                           row[hardpointMonitorTableAddressIndex], row[hardpointMonitorTableIndexIndex], getSubnet)
+        for row in forceActuatorTable:
+            self._addRoute(row[forceActuatorTableIDIndex], row[forceActuatorTableTypeIndex], row[forceActuatorTableSubnetIndex],
+                           row[forceActuatorTableAddressIndex], row[forceActuatorTableIndexIndex], getSubnet)
+
+    def _addRoute(self, id:int, kind:str, subnetNumber:int, address:int, row:int, getSubnet):
+        # the first table wins, the same order getSubnetAndAddress always searched in
+        if id in self._routes:
+            return
+        subnet = getSubnet(subnetNumber) if getSubnet is not None else None
+        self._routes[id] = ILCRoute(id, kind, subnetNumber, address, row, subnet)
+        self._idsBySubnetAndAddress.setdefault((subnetNumber, address), id)
+
+    def route(self, id:int):
+        route = self._routes.get(id)
+        if route is None:
+            raise Exception("There is no ILC with id " + str(id))
+        return route
+
+    def idForSubnetAndAddress(self, subnetNumber:int, address:int):
+        return self._idsBySubnetAndAddress.get((subnetNumber, address))
+
+    def routeForSubnetAndAddress(self, subnetNumber:int, address:int):
+        id = self._idsBySubnetAndAddress.get((subnetNumber, address))
+        if id is None:
+            return None
+        return self._routes[id]
+
+    def routes(self, kind:str = None):
+        return [route for route in self._routes.values() if kind is None or route.kind == kind]
+
+    def __contains__(self, id:int):
+        return id in self._routes
+
+    def __len__(self):
+        return len(self._routes)
@@ -1,13 +1,26 @@
 import binascii
+import mmap
+import os
 import struct
+import numpy as np
+import CRC
 from Simulator import Simulator
 
 '''
 This class simulates responses from the Inclinometer.  Returns a byte array 
 for each response possible.
 
+The response only depends on the angle in whole millidegrees, 360,000 values,
+so InclinometerFrameTable holds every finished frame: an angle maps to its
+frame with one index.  The table is built with NumPy on first use (about 3.6MB)
+or mapped from a file written by save().
+
 AWC 4 October 2017
 '''
+
+FRAME_SIZE = 10
+TABLE_SIZE = 360000
+
 class InclinometerSimulator(Simulator):
 
     # since there is only one response from the Inclinometer
@@ -16,14 +29,17 @@ class InclinometerSimulator(Simulator):
     FUNCTION_CODE = 3
     DATA_LENGTH = 4
     
-    def __init__(self):
-        pass
+    # frameTable is an InclinometerFrameTable, responses are looked up in it (as bytes) when given
+    def __init__(self, frameTable = None):
+        self.frameTable = frameTable
 
     ###############################################################################
     # inclinometerResponse
     def inclinometerResponse(self, degreesMeasured):
         if degreesMeasured < 0.0 or degreesMeasured >= 360.0:
             raise Exception("degreesMeasured is outside the valid range of values [0.0, 360.0)")
+        if self.frameTable is not None:
+            return self.frameTable.frame(degreesMeasured)
     
         response = bytearray()
         self.dataCheck(self.SERVER_ADDRESS, 'Server Address', response)
@@ -43,7 +59,83 @@ class InclinometerSimulator(Simulator):
         
         return response
 
+###############################################################################
+# The responses of millidegrees (an integer array) as an (N, FRAME_SIZE) uint8 array
+def encodeFrames(millidegrees):
+    millidegrees = np.asarray(millidegrees, dtype=np.uint32)
+    frames = np.empty((len(millidegrees), FRAME_SIZE), dtype=np.uint8)
+    frames[:, 0] = FRAME_SIZE - 1
+    frames[:, 1] = InclinometerSimulator.SERVER_ADDRESS
+    frames[:, 2] = InclinometerSimulator.FUNCTION_CODE
+    frames[:, 3] = InclinometerSimulator.DATA_LENGTH
+    # word swapped, the MSB is the 3rd byte
+    frames[:, 4] = (millidegrees >> 8) & 0xFF
+    frames[:, 5] = millidegrees & 0xFF
+    frames[:, 6] = millidegrees >> 24
+    frames[:, 7] = (millidegrees >> 16) & 0xFF
+    crc = CRC.calculateCRCArray(frames[:, 1:8])
+    frames[:, 8] = crc & 0xFF
+    frames[:, 9] = crc >> 8
+    return frames
+
+class InclinometerFrameTable:
+    '''
+    Every inclinometer response by millidegree.  Without path the table is built in memory on first use,
+    with path it is mapped from the file, which is written first when it does not exist.
+    '''
+
+    def __init__(self, path:str = None):
+        self.path = path
+        self._frames = None
+        self._mmap = None
+
+    def _load(self):
+        if self.path is None:
+            self._frames = encodeFrames(np.arange(TABLE_SIZE)).tobytes()
+            return self._frames
+        if not os.path.exists(self.path):
+            self.save(self.path)
+        with open(self.path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size != TABLE_SIZE * FRAME_SIZE:
+                raise Exception("The inclinometer frame table " + self.path + " has the wrong size, remove it to rebuild it")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._frames = self._mmap
+        # a table written by something else would go unnoticed until the frames are decoded
+        index = TABLE_SIZE - 1
+        if self._frames[index * FRAME_SIZE:(index + 1) * FRAME_SIZE] != encodeFrames([index]).tobytes():
+            raise Exception("The inclinometer frame table " + self.path + " does not hold inclinometer frames")
+        return self._frames
+
+    def save(self, path:str):
+        temporary = path + '.tmp'
+        encodeFrames(np.arange(TABLE_SIZE)).tofile(temporary)
+        os.replace(temporary, path)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._frames = None
+
+    ###############################################################################
+    # Response for degreesMeasured in [0, 360), the same bytes inclinometerResponse builds
+    def frame(self, degreesMeasured:float):
+        frames = self._frames if self._frames is not None else self._load()
+        start = int(degreesMeasured * 1000) * FRAME_SIZE
+        return frames[start:start + FRAME_SIZE]
+
+    # Indices of an array of angles in [0, 360)
+    def indices(self, degrees):
+        degrees = np.asarray(degrees, dtype=np.float64)
+        if np.any((degrees < 0.0) | (degrees >= 360.0) | np.isnan(degrees)):
+            raise Exception("The angles must be in the valid range of values [0.0, 360.0)")
+        return (degrees * 1000).astype(np.int64)
 
+    # Responses for an array of angles, (N, FRAME_SIZE) uint8
+    def frames(self, degrees):
+        frames = self._frames if self._frames is not None else self._load()
+        return np.frombuffer(frames, dtype=np.uint8).reshape(TABLE_SIZE, FRAME_SIZE)[self.indices(degrees)]
+#end class InclinometerFrameTable
 
 ###############################################################################
 # main - for testing
@@ -52,6 +144,10 @@ def main():
 
     response = inclinSim.inclinometerResponse(36.001)
     assert(bytes([9, 127, 3, 4, 140, 161, 00, 00, 0x1f, 0x46]) == response)
+    table = InclinometerFrameTable()
+    assert(bytes([9, 127, 3, 4, 140, 161, 00, 00, 0x1f, 0x46]) == InclinometerSimulator(table).inclinometerResponse(36.001))
+    assert(table.frames([36.001, 359.9999])[0].tobytes() == response)
+    assert(table.frames([359.9999])[0].tobytes() == inclinSim.inclinometerResponse(359.9999))
     print("Inclinometer Response: " + str(binascii.hexlify(response)))
     
 
@@ -0,0 +1,169 @@
+import time
+
+'''
+Switchable hot path instrumentation for CellSimulator.  attach() shadows the
+simulator's public set*/get* methods, its encoders (frame cache, batch
+encoder, sensor simulators), the ILC routing lookup and every client's send
+and sendFrames with timing wrappers stored as instance attributes.  detach()
+deletes them again, so with instrumentation off the original methods run and
+the cost is exactly zero.
+
+LatencyHistogram is an HDR style log-linear histogram: values below 128 ns
+have their own bucket, above that every power of two is split into 64
+buckets, so any recorded value is known to better than 1.6% in a fixed 2304
+counts regardless of how many values are recorded.
+'''
+
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF = SUB_BUCKET_COUNT >> 1
+# 2^41 ns is more than half an hour, longer values land in the last bucket
+MAX_SHIFT = 41 - SUB_BUCKET_BITS
+BUCKET_COUNT = SUB_BUCKET_COUNT + MAX_SHIFT * SUB_BUCKET_HALF
+# Accessors of the simulator itself, not simulated traffic
+UNCOUNTED_METHODS = ('getClients', 'getDOListener', 'getDigitalInputState', 'getFrameCacheStats')
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.reset()
+
+    def reset(self):
+        counts = self.counts
+        for i in range(BUCKET_COUNT):
+            counts[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    ##########################################################################################################
+    # Record one value in ns
+    def record(self, value:int):
+        if value < SUB_BUCKET_COUNT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BUCKET_BITS
+            if shift > MAX_SHIFT:
+                index = BUCKET_COUNT - 1
+            else:
+                index = SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF + (value >> shift) - SUB_BUCKET_HALF
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # Midpoint of the values of bucket index
+    @staticmethod
+    def bucketValue(index:int):
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift = (index - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF + 1
+        subBucket = (index - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF + SUB_BUCKET_HALF
+        return (subBucket << shift) + ((1 << shift) >> 1)
+
+    # Value (ns) at or below which percentile % of the recorded values are
+    def percentile(self, percentile:float):
+        if self.count == 0:
+            return 0
+        target = max(1, int(round(self.count * percentile / 100.0)))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.bucketValue(index), self.max)
+        return self.max
+
+    def stats(self):
+        return {'count' : self.count, 'min' : self.min if self.min is not None else 0, 'max' : self.max,
+                'mean' : self.total / self.count if self.count else 0.0, 'total' : self.total,
+                'p50' : self.percentile(50.0), 'p90' : self.percentile(90.0), 'p99' : self.percentile(99.0),
+                'p99.9' : self.percentile(99.9)}
+#end class LatencyHistogram
+
+class Instrumentation:
+
+    def __init__(self):
+        self.calls = {}
+        self.methodTime = {}
+        self.encode = LatencyHistogram()
+        self.routing = LatencyHistogram()
+        self.send = {}
+        self._attached = []
+
+    # Cleared in place, the attached wrappers hold these dicts
+    def resetStats(self):
+        self.calls.clear()
+        self.methodTime.clear()
+        self.encode.reset()
+        self.routing.reset()
+        for histogram in self.send.values():
+            histogram.reset()
+
+    def _shadow(self, target, name:str, wrapper):
+        setattr(target, name, wrapper)
+        self._attached.append((target, name))
+
+    def _countCalls(self, name:str, method):
+        calls = self.calls
+        methodTime = self.methodTime
+        clock = time.perf_counter_ns
+        def counted(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                calls[name] = calls.get(name, 0) + 1
+                methodTime[name] = methodTime.get(name, 0) + clock() - start
+        return counted
+
+    def _timed(self, histogram:LatencyHistogram, function):
+        record = histogram.record
+        clock = time.perf_counter_ns
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(clock() - start)
+        return timed
+
+    ##########################################################################################################
+    # Shadow the methods of sim with instrumented versions
+    def attach(self, sim):
+        if self._attached:
+            raise Exception("The instrumentation is already attached")
+        for name in dir(type(sim)):
+            if ((name.startswith('set') or name.startswith('get')) and name not in UNCOUNTED_METHODS
+                    and callable(getattr(type(sim), name))):
+                self._shadow(sim, name, self._countCalls(name, getattr(sim, name)))
+        # the counting wrapper of getSubnetAndAddress is timed as the routing
+        self._shadow(sim, 'getSubnetAndAddress', self._timed(self.routing, sim.getSubnetAndAddress))
+        self._shadow(sim._frameCache, 'encode', self._timed(self.encode, sim._frameCache.encode))
+        self._shadow(sim._faBatchEncoder, 'encode', self._timed(self.encode, sim._faBatchEncoder.encode))
+        self._shadow(sim._inclinSim, 'inclinometerResponse', self._timed(self.encode, sim._inclinSim.inclinometerResponse))
+        self._shadow(sim._displaceSim, 'displacementResponse', self._timed(self.encode, sim._displaceSim.displacementResponse))
+        self._shadow(sim._accelSim, 'accelerometerResponse', self._timed(self.encode, sim._accelSim.accelerometerResponse))
+        for client, kind in sim.getClients():
+            histogram = self.send.setdefault(kind, LatencyHistogram())
+            self._shadow(client, 'send', self._timed(histogram, client.send))
+            self._shadow(client, 'sendFrames', self._timed(histogram, client.sendFrames))
+
+    # Remove every wrapper, in reverse so a method wrapped twice gets its original back
+    def detach(self):
+        for target, name in reversed(self._attached):
+            if name in vars(target):
+                delattr(target, name)
+        self._attached = []
+
+    def attached(self):
+        return bool(self._attached)
+
+    def stats(self):
+        return {'calls' : dict(self.calls), 'methodTime' : dict(self.methodTime), 'encode' : self.encode.stats(),
+                'routing' : self.routing.stats(), 'send' : {kind : histogram.stats() for kind, histogram in self.send.items()}}
+#end class Instrumentation
@@ -0,0 +1,193 @@
+import atexit
+import itertools
+import json
+import sys
+import threading
+import time
+from collections import deque
+
+'''
+Buffered structured logger behind Utilities.Log and Utilities.Result.
+
+log() only checks the level and appends the raw record (sequence number,
+monotonic time, level, format, args) to a fixed capacity ring buffer, a
+bounded deque whose appends are atomic so producers take no lock.  A
+background flusher formats the records and writes them to the sinks every
+flushInterval seconds, so the caller never pays for datetime, strftime,
+string formatting or stdout.
+Records below the level are rejected by one comparison, callers on hot paths
+can skip building the arguments too with isEnabled(level).
+
+    logger = Logger(level = DEBUG, sinks = [TextSink(), JSONLSink('run.jsonl')])
+    logger.log(INFO, "Setting inclinometer angle to %0.3f", angle)
+
+When the buffer is full the oldest records are overwritten, the flusher counts
+them in dropped from the gaps in the sequence numbers.  Arguments are
+formatted at flush time, pass immutable values.
+
+With synchronous = True every record is written before log() returns, in
+order with print() output and without losses on a crash, which is what test
+scripts want.  Records at flushLevel (WARNING) and above are always written
+immediately, together with everything buffered before them.
+'''
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LEVEL_NAMES = {DEBUG : 'DEBUG', INFO : 'INFO', WARNING : 'WARNING', ERROR : 'ERROR'}
+
+class TextSink:
+    '''
+    Writes "<local time>: <message>" lines, the format Utilities always printed.
+    '''
+
+    def __init__(self, stream = None):
+        self.stream = stream
+        self._second = None
+        self._secondText = ''
+
+    def write(self, wallTime:float, monotonic:float, level:int, message:str):
+        second = int(wallTime)
+        if second != self._second:
+            self._second = second
+            self._secondText = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(second))
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.write(self._secondText + ": " + message + "\n")
+
+    def flush(self):
+        stream = self.stream if self.stream is not None else sys.stdout
+        stream.flush()
+
+    def close(self):
+        self.flush()
+
+class JSONLSink:
+    '''
+    Writes one JSON object per record: time (epoch seconds), monotonic, level and message.
+    '''
+
+    def __init__(self, path:str):
+        self.path = path
+        self._file = open(path, 'a')
+
+    def write(self, wallTime:float, monotonic:float, level:int, message:str):
+        self._file.write(json.dumps({'time' : wallTime, 'monotonic' : monotonic,
+                                     'level' : LEVEL_NAMES.get(level, str(level)), 'message' : message}) + "\n")
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class Logger:
+
+    def __init__(self, capacity:int = 65536, level:int = INFO, sinks = None, flushInterval:float = 0.05,
+                 synchronous:bool = False, flushLevel:int = WARNING):
+        if capacity <= 0:
+            raise Exception("capacity must be greater than 0, it is currently " + str(capacity))
+        self.capacity = capacity
+        self.level = level
+        self.sinks = sinks if sinks is not None else [TextSink()]
+        self.flushInterval = flushInterval
+        self.synchronous = synchronous
+        self.flushLevel = flushLevel
+        self.dropped = 0
+        self.written = 0
+        # monotonic to wall clock, taken once so records keep their monotonic order
+        self._wallOffset = time.time() - time.monotonic()
+        self._records = deque(maxlen=capacity)
+        self._sequence = itertools.count()
+        self._nextSequence = 0
+        self._wakeSize = capacity // 2
+        self._flushLock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def isEnabled(self, level:int):
+        return level >= self.level
+
+    ##########################################################################################################
+    # Store one record, message % args is formatted later by the flusher
+    def log(self, level:int, message:str, *args):
+        if level < self.level:
+            return
+        records = self._records
+        records.append((next(self._sequence), time.monotonic(), level, message, args))
+        if self.synchronous or level >= self.flushLevel:
+            self.flush()
+            return
+        if len(records) >= self._wakeSize:
+            self._wake.set()
+        if not self._running:
+            self.start()
+
+    def debug(self, message:str, *args):
+        self.log(DEBUG, message, *args)
+
+    def info(self, message:str, *args):
+        self.log(INFO, message, *args)
+
+    def warning(self, message:str, *args):
+        self.log(WARNING, message, *args)
+
+    def error(self, message:str, *args):
+        self.log(ERROR, message, *args)
+
+    def _take(self):
+        popleft = self._records.popleft
+        records = [popleft() for i in range(len(self._records))]
+        if records:
+            self.dropped += records[0][0] - self._nextSequence
+            self._nextSequence = records[-1][0] + 1
+        return records
+
+    ##########################################################################################################
+    # Format and write every buffered record now, in the calling thread
+    def flush(self):
+        with self._flushLock:
+            records = self._take()
+            wallOffset = self._wallOffset
+            for sequence, monotonic, level, message, args in records:
+                if args:
+                    try:
+                        message = message % args
+                    except (TypeError, ValueError) as error:
+                        message = "%s %r (formatting failed: %s)" % (message, args, error)
+                for sink in self.sinks:
+                    sink.write(monotonic + wallOffset, monotonic, level, message)
+            if records:
+                for sink in self.sinks:
+                    sink.flush()
+            self.written += len(records)
+
+    def start(self):
+        with self._flushLock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.flushInterval)
+            self._wake.clear()
+            self.flush()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def close(self):
+        self.stop()
+        for sink in self.sinks:
+            sink.close()
+#end class Logger
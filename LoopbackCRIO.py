@@ -0,0 +1,255 @@
+import argparse
+import multiprocessing
+import selectors
+import socket
+import threading
+import time
+import numpy as np
+import FrameDecoder
+from CellSimulator import CellSimulator
+
+'''
+Local stand-in for the cRIO/FPGA side, so CellSimulator can be exercised on
+localhost without hardware.  It binds the subnet, inclinometer, displacement,
+accelerometer, DI and DO ports (5005-5014), decodes every datagram with
+FrameDecoder, counts datagrams/frames/bytes per stream and ILC
+frames per function code, and answers each DO request on the response port
+(4999) with [cRIO port number, '0' or '1'] the way getDO reads it.
+
+For end to end measurements measureThroughput tags the 75 frames of each
+mirror update with a sequence number in the primary force, which the
+receiver uses to compute latency percentiles, out of order frames and loss:
+
+    python LoopbackCRIO.py --duration 5
+'''
+
+STREAM_NAMES = {
+    CellSimulator.SubnetAPort : 'Subnet A',
+    CellSimulator.SubnetBPort : 'Subnet B',
+    CellSimulator.SubnetCPort : 'Subnet C',
+    CellSimulator.SubnetDPort : 'Subnet D',
+    CellSimulator.SubnetEPort : 'Subnet E',
+    CellSimulator.InclinometerPort : 'Inclinometer',
+    CellSimulator.DisplacementPort : 'Displacement',
+    CellSimulator.AccelerometerPort : 'Accelerometer',
+    CellSimulator.DigitalInputPort : 'DI',
+    CellSimulator.DigitalOutputPort : 'DO',
+    }
+
+RECEIVE_BUFFER_SIZE = 1 << 22
+
+class LoopbackCRIO:
+
+    # portOffset shifts every port, so several stand-ins can run side by side
+    def __init__(self, ipAddress:str = '127.0.0.1', responseAddress:str = '127.0.0.1', portOffset:int = 0, trackSequence:bool = False):
+        self.ipAddress = ipAddress
+        self.responseAddress = (responseAddress, CellSimulator.ResponsePort + portOffset)
+        self.portOffset = portOffset
+        self.trackSequence = trackSequence
+        self.digitalOutputs = {}
+        self._sockets = []
+        self._running = False
+        self._thread = None
+        self.reset()
+
+    def reset(self):
+        self.datagrams = {name : 0 for name in STREAM_NAMES.values()}
+        self.frames = {name : 0 for name in STREAM_NAMES.values()}
+        self.bytes = {name : 0 for name in STREAM_NAMES.values()}
+        self.functionCodes = {}
+        self.malformed = 0
+        self.doResponses = 0
+        self.outOfOrder = 0
+        self._lastSequence = {}
+        self._sequences = []
+        self._receiveTimes = []
+
+    def open(self):
+        self._selector = selectors.DefaultSelector()
+        for port in STREAM_NAMES:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER_SIZE)
+            sock.bind((self.ipAddress, port + self.portOffset))
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ, STREAM_NAMES[port])
+            self._sockets.append(sock)
+        self._responseSocket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def close(self):
+        for sock in self._sockets:
+            self._selector.unregister(sock)
+            sock.close()
+        self._sockets = []
+        self._responseSocket.close()
+        self._selector.close()
+
+    ##########################################################################################################
+    # Receive until stop() is called, in the calling thread
+    def run(self):
+        self._running = True
+        select = self._selector.select
+        handle = self.handleDatagram
+        while self._running:
+            for key, events in select(0.1):
+                sock = key.fileobj
+                stream = key.data
+                while True:
+                    try:
+                        data = sock.recv(65535)
+                    except BlockingIOError:
+                        break
+                    handle(stream, data, time.monotonic())
+
+    def start(self):
+        self.open()
+        self._running = True
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    ##########################################################################################################
+    # Split a datagram into its length prefixed frames and account for them
+    def handleDatagram(self, stream:str, data:bytes, receiveTime:float):
+        self.datagrams[stream] += 1
+        self.bytes[stream] += len(data)
+        try:
+            offsets = FrameDecoder.splitFrames(data)
+        except Exception:
+            self.malformed += 1
+            return
+        self.frames[stream] += len(offsets)
+        if stream.startswith('Subnet'):
+            columns = FrameDecoder.decodeILCColumns(data, offsets)
+            functions, counts = np.unique(columns.function, return_counts=True)
+            for function, count in zip(functions.tolist(), counts.tolist()):
+                key = (stream, function)
+                self.functionCodes[key] = self.functionCodes.get(key, 0) + count
+            if self.trackSequence:
+                forces = columns.function == 75
+                self._trackSequences(stream, columns.address[forces], columns.primaryForce[forces], receiveTime)
+        elif stream == 'DO':
+            for offset in offsets:
+                self._respond(FrameDecoder.decodeDigitalOutput(data, offset).cRioPort)
+
+    def _trackSequences(self, stream:str, addresses, sequences, receiveTime:float):
+        sequences = sequences.astype(np.int64)
+        lastSequence = self._lastSequence
+        for address, sequence in zip(addresses.tolist(), sequences.tolist()):
+            key = (stream, address)
+            if sequence < lastSequence.get(key, -1):
+                self.outOfOrder += 1
+            else:
+                lastSequence[key] = sequence
+        self._sequences.append(sequences)
+        self._receiveTimes.append(np.full(len(sequences), receiveTime))
+
+    def _respond(self, cRioPort:int):
+        value = self.digitalOutputs.get(cRioPort, True)
+        self._responseSocket.sendto(bytes([cRioPort, ord('1') if value else ord('0')]), self.responseAddress)
+        self.doResponses += 1
+
+    def report(self):
+        return {'datagrams' : dict(self.datagrams), 'frames' : dict(self.frames), 'bytes' : dict(self.bytes),
+                'functionCodes' : {'%s/%d' % key : count for key, count in self.functionCodes.items()},
+                'malformed' : self.malformed, 'doResponses' : self.doResponses, 'outOfOrder' : self.outOfOrder,
+                'sequences' : np.concatenate(self._sequences) if self._sequences else np.zeros(0, dtype=np.int64),
+                'receiveTimes' : np.concatenate(self._receiveTimes) if self._receiveTimes else np.zeros(0)}
+
+def _runProcess(ipAddress, responseAddress, portOffset, trackSequence, ready, stop, results):
+    crio = LoopbackCRIO(ipAddress, responseAddress, portOffset, trackSequence)
+    crio.open()
+    thread = threading.Thread(target=crio.run, daemon=True)
+    thread.start()
+    ready.set()
+    stop.wait()
+    # let the last datagrams drain
+    time.sleep(0.2)
+    crio._running = False
+    thread.join()
+    crio.close()
+    results.send(crio.report())
+
+class LoopbackCRIOProcess:
+    '''
+    Runs a LoopbackCRIO in its own process so it does not compete with the simulator for the GIL.
+    time.monotonic is system wide, so receive times are comparable with the sender's.
+    '''
+
+    def __init__(self, ipAddress:str = '127.0.0.1', responseAddress:str = '127.0.0.1', portOffset:int = 0, trackSequence:bool = True):
+        self._ready = multiprocessing.Event()
+        self._stop = multiprocessing.Event()
+        self._results, results = multiprocessing.Pipe(False)
+        self._process = multiprocessing.Process(target=_runProcess, daemon=True,
+            args=(ipAddress, responseAddress, portOffset, trackSequence, self._ready, self._stop, results))
+
+    def start(self, timeout:float = 10.0):
+        self._process.start()
+        if not self._ready.wait(timeout):
+            raise Exception("The loopback cRIO did not start within " + str(timeout) + "s")
+
+    # Stop the receiver and return its report
+    def stop(self):
+        self._stop.set()
+        report = self._results.recv()
+        self._process.join()
+        return report
+
+##########################################################################################################
+# Drive sim with whole mirror FA updates for duration seconds (as fast as possible when rate is None)
+# against a LoopbackCRIOProcess and report delivered updates/s, latency percentiles, out of order and loss.
+def measureThroughput(sim:CellSimulator, duration:float = 5.0, rate:float = None):
+    crio = LoopbackCRIOProcess()
+    crio.start()
+    ids = sim._faBatchEncoder.ids
+    sendTimes = [0.0]
+    period = 1.0 / rate if rate is not None else 0.0
+    start = time.monotonic()
+    end = start + duration
+    sequence = 0
+    now = start
+    while now < end:
+        # the sequence number is the primary force, exact in a float up to 2^24
+        sequence += 1
+        sendTimes.append(time.monotonic())
+        sim.setFAForceAndStatusBatch(ids, 0, float(sequence), 0.0)
+        now = time.monotonic()
+        if period:
+            delay = start + sequence * period - now
+            if delay > 0:
+                time.sleep(delay)
+                now = time.monotonic()
+    elapsed = time.monotonic() - start
+    report = crio.stop()
+
+    sendTimes = np.array(sendTimes)
+    sequences = report['sequences']
+    received = len(sequences)
+    sent = sequence * len(ids)
+    latencies = report['receiveTimes'] - sendTimes[sequences] if received else np.zeros(1)
+    percentiles = np.percentile(latencies, [50.0, 90.0, 99.0, 99.9]) * 1e6
+    result = {'updates' : sequence, 'framesSent' : sent, 'framesReceived' : received,
+              'loss' : 1.0 - received / sent if sent else 0.0, 'outOfOrder' : report['outOfOrder'],
+              'actuatorUpdatesPerSecond' : received / elapsed, 'mirrorUpdatesPerSecond' : sequence / elapsed,
+              'latencyP50us' : float(percentiles[0]), 'latencyP90us' : float(percentiles[1]), 'latencyP99us' : float(percentiles[2]),
+              'latencyP999us' : float(percentiles[3]), 'latencyMaxUs' : float(latencies.max()) * 1e6,
+              'frames' : report['frames'], 'malformed' : report['malformed']}
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Localhost cRIO stand-in throughput measurement')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--rate', type=float, default=None, help='mirror updates per second, as fast as possible if omitted')
+    args = parser.parse_args()
+    sim = CellSimulator('127.0.0.1', responseAddress='127.0.0.1')
+    result = measureThroughput(sim, args.duration, args.rate)
+    for key, value in result.items():
+        print("%s: %s" % (key, value))
+
+if __name__ == "__main__":
+    main()
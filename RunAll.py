@@ -1,9 +1,6 @@
+import ScenarioRunner
 
-import M1M3
-import CellSimulator
-import VerifyStateChanges
-
-m1m3 = M1M3.M1M3()
-sim = CellSimulator.CellSimulator("140.252.32.151", True)
-
-VerifyStateChanges.VerifyStateChanges().run()
+# Every Verify*.py scenario against the cRIO, see ScenarioRunner for running them on loopback cRIOs in parallel
+ScenarioRunner.discover()
+if not ScenarioRunner.report(ScenarioRunner.runAll(ipAddress = "140.252.32.151")):
+    raise SystemExit(1)
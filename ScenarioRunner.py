@@ -0,0 +1,224 @@
+import argparse
+import concurrent.futures
+import glob
+import importlib
+import inspect
+import multiprocessing
+import os
+import time
+import traceback
+from collections import namedtuple
+import Utilities
+from Utilities import Log
+
+'''
+Registry and parallel runner for test scenarios, classes in the style of
+VerifyStateChanges with a run method whose parameters name the fixtures it
+needs:
+
+    class VerifyStateChanges:
+        def run(self, m1m3, sim):
+            ...
+
+Scenarios are registered with @scenario or found by discover(), which imports
+the Verify*.py modules and registers every class with a run method.  Fixtures
+are made by the factories registered with @fixture, once per worker, and
+passed to run by parameter name: sim is a CellSimulator, crio the LoopbackCRIO
+it sends to and m1m3 an M1M3.
+
+Scenarios run in a process pool.  Every worker takes its own slot, so its
+simulator and loopback cRIO use ports shifted by slot * PORT_RANGE and never
+collide with another worker's.  A scenario passes when it raises nothing and
+none of its checks (Utilities.Result) is an anomaly.  Scenarios sharing
+something outside the worker, such as the one M1M3 behind SAL, set
+parallel = False and run one at a time once the pool is done.
+
+    python ScenarioRunner.py --workers 8
+'''
+
+# Ports of worker slot n are shifted by (n + 1) * PORT_RANGE, slot 0 keeps clear of the default ports
+PORT_RANGE = 100
+
+ScenarioResult = namedtuple('ScenarioResult', 'name passed checks anomalies duration error worker')
+
+scenarios = {}
+fixtures = {}
+
+##########################################################################################################
+# Register cls (used as @scenario or @scenario(name = ...)) under name, its class name by default
+def scenario(cls = None, name:str = None):
+    def register(cls):
+        scenarios[name if name is not None else cls.__name__] = cls
+        return cls
+    if cls is not None:
+        return register(cls)
+    return register
+
+# Register factory(context) as the fixture name, context is the worker's WorkerContext
+def fixture(name:str):
+    def register(factory):
+        fixtures[name] = factory
+        return factory
+    return register
+
+##########################################################################################################
+# Import the modules matching pattern in directory and register every class defined there with a run method
+def discover(pattern:str = 'Verify*.py', directory:str = None):
+    directory = directory if directory is not None else os.path.dirname(os.path.abspath(__file__))
+    found = []
+    for path in sorted(glob.glob(os.path.join(directory, pattern))):
+        module = importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+        for name, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ == module.__name__ and callable(getattr(cls, 'run', None)):
+                scenario(cls)
+                found.append(name)
+    return found
+
+# Fixture names the run method of cls takes
+def fixtureNames(cls):
+    return [name for name in inspect.signature(cls.run).parameters if name != 'self']
+
+class WorkerContext:
+    '''
+    What the fixtures of one worker are made from, and the fixtures made so far.
+    '''
+
+    def __init__(self, slot:int, ipAddress:str = None):
+        self.slot = slot
+        # None sends to a loopback cRIO of the worker's own, otherwise to the cRIO at ipAddress on its own ports
+        self.ipAddress = ipAddress
+        self.portOffset = (slot + 1) * PORT_RANGE if ipAddress is None else 0
+        self._fixtures = {}
+
+    def get(self, name:str):
+        if name not in self._fixtures:
+            if name not in fixtures:
+                raise Exception("No fixture named " + name + ", the fixtures are " + ", ".join(sorted(fixtures)))
+            self._fixtures[name] = fixtures[name](self)
+        return self._fixtures[name]
+
+    def close(self):
+        for value in reversed(list(self._fixtures.values())):
+            for method in ('close', 'stop'):
+                if callable(getattr(value, method, None)):
+                    getattr(value, method)()
+                    break
+        self._fixtures = {}
+#end class WorkerContext
+
+@fixture('crio')
+def makeLoopbackCRIO(context:WorkerContext):
+    import LoopbackCRIO
+    crio = LoopbackCRIO.LoopbackCRIO('127.0.0.1', '127.0.0.1', context.portOffset)
+    crio.start()
+    return crio
+
+@fixture('sim')
+def makeCellSimulator(context:WorkerContext):
+    import CellSimulator
+    if context.ipAddress is None:
+        context.get('crio')
+        return CellSimulator.CellSimulator('127.0.0.1', False, '127.0.0.1', context.portOffset)
+    return CellSimulator.CellSimulator(context.ipAddress, False, None, context.portOffset)
+
+@fixture('m1m3')
+def makeM1M3(context:WorkerContext):
+    import M1M3
+    return M1M3.M1M3()
+
+##########################################################################################################
+# Run the scenario registered as name with the fixtures of context
+def runScenario(name:str, context:WorkerContext):
+    cls = scenarios[name]
+    passes = Utilities.ResultCounts["PASS"]
+    anomalies = Utilities.ResultCounts["ANOM"]
+    error = None
+    start = time.monotonic()
+    try:
+        arguments = {fixtureName : context.get(fixtureName) for fixtureName in fixtureNames(cls)}
+        cls().run(**arguments)
+    except Exception:
+        error = traceback.format_exc()
+    duration = time.monotonic() - start
+    anomalies = Utilities.ResultCounts["ANOM"] - anomalies
+    checks = Utilities.ResultCounts["PASS"] - passes + anomalies
+    Utilities.FlushLog()
+    return ScenarioResult(name, error is None and anomalies == 0, checks, anomalies, duration, error, context.slot)
+
+# State of a pool worker, set by _initWorker
+_context = None
+
+def _initWorker(slots, ipAddress, registry):
+    global _context
+    # with the spawn start method the registrations of the parent are not inherited
+    for name, (module, className) in registry.items():
+        scenarios[name] = getattr(importlib.import_module(module), className)
+    _context = WorkerContext(slots.get(), ipAddress)
+
+def _runInWorker(name:str):
+    return runScenario(name, _context)
+
+##########################################################################################################
+# Run the scenarios named (every registered one by default) on workers processes, the parallel = False
+# ones afterwards in this process.  Returns the ScenarioResults in the order of names.
+def runAll(names = None, workers:int = None, ipAddress:str = None):
+    names = list(names) if names is not None else sorted(scenarios)
+    for name in names:
+        if name not in scenarios:
+            raise Exception("No scenario named " + name)
+    parallel = [name for name in names if getattr(scenarios[name], 'parallel', True)]
+    serial = [name for name in names if name not in parallel]
+    workers = max(1, min(workers if workers is not None else os.cpu_count() or 1, len(parallel)))
+    if ipAddress is not None and parallel:
+        # one cRIO can only be driven by one simulator at a time
+        workers = 1
+    results = {}
+    if parallel:
+        Log("ScenarioRunner: Running %d scenarios on %d workers", len(parallel), workers)
+        # forked workers would write the records still buffered again
+        Utilities.FlushLog()
+        registry = {name : (scenarios[name].__module__, scenarios[name].__name__) for name in parallel}
+        with multiprocessing.Manager() as manager:
+            slots = manager.Queue()
+            for slot in range(workers):
+                slots.put(slot)
+            with concurrent.futures.ProcessPoolExecutor(workers, initializer=_initWorker,
+                                                        initargs=(slots, ipAddress, registry)) as pool:
+                for name, result in zip(parallel, pool.map(_runInWorker, parallel)):
+                    results[name] = result
+    if serial:
+        Log("ScenarioRunner: Running %d scenarios one at a time", len(serial))
+        context = WorkerContext(workers, ipAddress)
+        try:
+            for name in serial:
+                results[name] = runScenario(name, context)
+        finally:
+            context.close()
+    return [results[name] for name in names]
+
+# Log one line per scenario and the totals, returns True if every scenario passed
+def report(results):
+    for result in results:
+        Log("ScenarioRunner: %s %s in %0.3fs, %d checks, %d anomalies (worker %d)", "PASS" if result.passed else "FAIL",
+            result.name, result.duration, result.checks, result.anomalies, result.worker)
+        if result.error is not None:
+            Log("ScenarioRunner: %s raised\n%s", result.name, result.error)
+    passed = sum(1 for result in results if result.passed)
+    Log("ScenarioRunner: %d of %d scenarios passed, %d checks, %d anomalies", passed, len(results),
+        sum(result.checks for result in results), sum(result.anomalies for result in results))
+    Utilities.FlushLog()
+    return passed == len(results)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the registered test scenarios in parallel")
+    parser.add_argument('names', nargs='*', help="scenarios to run, every discovered one by default")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, the number of cores by default")
+    parser.add_argument('--pattern', default='Verify*.py', help="modules to discover scenarios in")
+    parser.add_argument('--ip', default=None, help="cRIO address, a loopback cRIO per worker by default")
+    args = parser.parse_args()
+    discover(args.pattern)
+    if not report(runAll(args.names or None, args.workers, args.ip)):
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+import math
+import numpy as np
+import TelemetryScheduler
+import DisplaceSimulator
+import InclinometerSimulator
+
+'''
+Precomputed sensor time series for the inclinometer, the 8 IMS displacement
+channels and the 8 accelerometer channels.  Every generator returns a
+Trajectory, an (N, channels) float64 array sampled at a fixed rate, built with
+NumPy before the run.  streamTrajectory then feeds it to a CellSimulator setter
+through a TelemetryScheduler, converting rows to Python floats a chunk at a
+time, so a producer call is an index and the setter, nothing else:
+
+    scheduler = TelemetryScheduler.TelemetryScheduler()
+    streamInclinometer(scheduler, 'Inclinometer', elevationSweep(10.0, 90.0, 20.0, 1.0), sim)
+    streamDisplacement(scheduler, 'IMS', sinusoidalDisplacement(50.0, 3600.0, 0.5, 0.1), sim)
+    streamTrajectory(scheduler, 'Accelerometer', accelerometerNoise(50.0, 3600.0, 0.02, 0.5, 10.0), sim.setAccelerometer)
+    scheduler.run(3600.0)
+'''
+
+IMS_CHANNELS = 8
+ACCELEROMETER_CHANNELS = 8
+# DisplacementSimulator range
+DISPLACEMENT_LIMIT = 999.9999
+# Rows converted to Python floats at once while streaming
+STREAM_CHUNK = 1024
+
+class Trajectory:
+
+    def __init__(self, rate:float, values):
+        if rate <= 0.0:
+            raise Exception("The rate must be greater than 0, it is currently " + str(rate))
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        self.rate = rate
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def channels(self):
+        return self.values.shape[1]
+
+    @property
+    def duration(self):
+        return len(self.values) / self.rate
+
+    def times(self):
+        return np.arange(len(self.values)) / self.rate
+
+    # Rows start to end as tuples of Python floats, ready to be splatted into a setter
+    def rows(self, start:int = 0, end:int = None):
+        return [tuple(row) for row in self.values[start:end].tolist()]
+
+    ##########################################################################################################
+    # This trajectory followed by others sampled at the same rate with the same channels
+    def concatenate(self, *others):
+        for other in others:
+            if other.rate != self.rate or other.channels != self.channels:
+                raise Exception("Only trajectories with the same rate and channels can be concatenated")
+        return Trajectory(self.rate, np.concatenate([self.values] + [other.values for other in others]))
+#end class Trajectory
+
+def _sampleCount(rate:float, duration:float):
+    if duration <= 0.0:
+        raise Exception("The duration must be greater than 0, it is currently " + str(duration))
+    return max(1, int(round(duration * rate)))
+
+def _channelValues(value, channels:int, name:str):
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim != 0 and value.shape != (channels,):
+        raise Exception(name + " must be a scalar or have " + str(channels) + " values, it has shape " + str(value.shape))
+    return np.broadcast_to(value, (channels,))
+
+##########################################################################################################
+# Inclinometer sweep from startAngle to endAngle degrees with a peak speed of speed degrees/s.
+# The motion is a raised cosine, so velocity and acceleration are continuous at both ends.  The sweep
+# is followed by dwell seconds at endAngle and, with returnSweep, the same sweep back and another dwell.
+def elevationSweep(rate:float, startAngle:float, endAngle:float, speed:float, dwell:float = 0.0, returnSweep:bool = False):
+    if speed <= 0.0:
+        raise Exception("The speed must be greater than 0, it is currently " + str(speed))
+    # peak speed of the raised cosine is (pi / 2) * distance / time
+    sweepTime = max(math.pi / 2.0 * abs(endAngle - startAngle) / speed, 1.0 / rate)
+    t = np.arange(_sampleCount(rate, sweepTime)) / rate
+    sweep = startAngle + (endAngle - startAngle) * (1.0 - np.cos(np.pi * t / sweepTime)) / 2.0
+    parts = [sweep, np.full(int(round(dwell * rate)), float(endAngle))]
+    if returnSweep:
+        parts += [sweep[::-1], np.full(int(round(dwell * rate)), float(startAngle))]
+    # the inclinometer reports [0, 360)
+    return Trajectory(rate, np.mod(np.concatenate(parts), 360.0))
+
+##########################################################################################################
+# IMS displacements offsets + amplitudes * sin(2 pi frequencies t + phases), every parameter is a scalar
+# or one value per channel (mm, Hz, radians)
+def sinusoidalDisplacement(rate:float, duration:float, amplitudes, frequencies, phases = 0.0, offsets = 0.0):
+    t = (np.arange(_sampleCount(rate, duration)) / rate)[:, None]
+    amplitudes = _channelValues(amplitudes, IMS_CHANNELS, 'amplitudes')
+    frequencies = _channelValues(frequencies, IMS_CHANNELS, 'frequencies')
+    phases = _channelValues(phases, IMS_CHANNELS, 'phases')
+    offsets = _channelValues(offsets, IMS_CHANNELS, 'offsets')
+    values = offsets + amplitudes * np.sin(2.0 * np.pi * frequencies * t + phases)
+    return Trajectory(rate, np.clip(values, -DISPLACEMENT_LIMIT, DISPLACEMENT_LIMIT))
+
+##########################################################################################################
+# IMS displacements holding levels[0] until stepTimes[0], levels[1] until stepTimes[1] and so on.
+# levels has one more entry than stepTimes, each a scalar or one value per channel (mm).
+def stepDisplacement(rate:float, duration:float, stepTimes, levels):
+    stepTimes = np.asarray(stepTimes, dtype=np.float64)
+    if len(levels) != len(stepTimes) + 1:
+        raise Exception("levels must have one more entry than stepTimes, it has " + str(len(levels)) + " for " + str(len(stepTimes)) + " steps")
+    levels = np.array([_channelValues(level, IMS_CHANNELS, 'levels') for level in levels])
+    if np.any(np.diff(stepTimes) < 0.0):
+        raise Exception("stepTimes must be in increasing order")
+    t = np.arange(_sampleCount(rate, duration)) / rate
+    values = levels[np.searchsorted(stepTimes, t, side='right')]
+    return Trajectory(rate, np.clip(values, -DISPLACEMENT_LIMIT, DISPLACEMENT_LIMIT))
+
+##########################################################################################################
+# Accelerometer noise (m/s^2) limited to the lowFrequency..highFrequency Hz band and scaled to rms on
+# every channel.  The band is cut in the frequency domain of the whole series, so it is exact and
+# there is no filter start up transient.  seed makes the series reproducible.
+def accelerometerNoise(rate:float, duration:float, rms, lowFrequency:float, highFrequency:float, seed:int = None):
+    if not 0.0 <= lowFrequency < highFrequency <= rate / 2.0:
+        raise Exception("The band must satisfy 0 <= lowFrequency < highFrequency <= rate / 2, it is currently ["
+                        + str(lowFrequency) + ", " + str(highFrequency) + "] at " + str(rate) + "Hz")
+    count = _sampleCount(rate, duration)
+    generator = np.random.default_rng(seed)
+    spectrum = np.fft.rfft(generator.standard_normal((count, ACCELEROMETER_CHANNELS)), axis=0)
+    frequencies = np.fft.rfftfreq(count, 1.0 / rate)
+    spectrum[(frequencies < lowFrequency) | (frequencies > highFrequency)] = 0.0
+    values = np.fft.irfft(spectrum, count, axis=0)
+    currentRms = np.sqrt(np.mean(values * values, axis=0))
+    currentRms[currentRms == 0.0] = 1.0
+    return Trajectory(rate, values * (_channelValues(rms, ACCELEROMETER_CHANNELS, 'rms') / currentRms))
+
+##########################################################################################################
+# Add a stream calling setter(*row) for every row of trajectory at the trajectory's rate.  Without loop
+# the stream goes quiet once the trajectory is exhausted, with loop it starts over.
+def streamTrajectory(scheduler:TelemetryScheduler.TelemetryScheduler, name:str, trajectory:Trajectory, setter,
+                     loop:bool = False, overrunPolicy:str = TelemetryScheduler.SKIP):
+    count = len(trajectory)
+    chunk = [-1, None]
+
+    def produce(tick:int):
+        if tick >= count:
+            if not loop:
+                return
+            tick %= count
+        start = tick - tick % STREAM_CHUNK
+        if chunk[0] != start:
+            chunk[0] = start
+            chunk[1] = trajectory.rows(start, start + STREAM_CHUNK)
+        setter(*chunk[1][tick - start])
+
+    return scheduler.addStream(name, trajectory.rate, produce, overrunPolicy)
+
+##########################################################################################################
+# streamTrajectory for IMS displacements, every response is encoded before the run
+# (DisplacementSimulator.displacementResponses) and a producer call only sends the row of its tick.
+def streamDisplacement(scheduler:TelemetryScheduler.TelemetryScheduler, name:str, trajectory:Trajectory, sim,
+                       loop:bool = False, overrunPolicy:str = TelemetryScheduler.SKIP):
+    count = len(trajectory)
+    responses = DisplaceSimulator.DisplacementSimulator().displacementResponses(trajectory.values).tobytes()
+    size = DisplaceSimulator.RESPONSE_SIZE
+    send = sim.setDisplacementFrame
+
+    def produce(tick:int):
+        if tick >= count:
+            if not loop:
+                return
+            tick %= count
+        send(responses[tick * size:(tick + 1) * size])
+
+    return scheduler.addStream(name, trajectory.rate, produce, overrunPolicy)
+
+##########################################################################################################
+# streamTrajectory for the inclinometer, the responses of every angle are looked up in table (an
+# InclinometerSimulator.InclinometerFrameTable, a new one by default) before the run.
+def streamInclinometer(scheduler:TelemetryScheduler.TelemetryScheduler, name:str, trajectory:Trajectory, sim,
+                       loop:bool = False, overrunPolicy:str = TelemetryScheduler.SKIP, table = None):
+    table = table if table is not None else InclinometerSimulator.InclinometerFrameTable()
+    count = len(trajectory)
+    responses = table.frames(trajectory.values[:, 0]).tobytes()
+    size = InclinometerSimulator.FRAME_SIZE
+    send = sim.setInclinometerFrame
+
+    def produce(tick:int):
+        if tick >= count:
+            if not loop:
+                return
+            tick %= count
+        send(responses[tick * size:(tick + 1) * size])
+
+    return scheduler.addStream(name, trajectory.rate, produce, overrunPolicy)
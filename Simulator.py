@@ -1,5 +1,6 @@
 import binascii
 import struct
+import CRC
 
 '''
 This is the super class that simulates responses from the all the Simulators.
@@ -50,17 +51,7 @@ class Simulator:
             raise Exception(parameterName + " has a type that we are unable to process.  Throwing exception")
 
     ##########################################################################################################
-    # Computing the 16-bit CRC value of data
+    # Computing the 16-bit CRC value of data and appending it (little endian) to aByteArray
     def calculateCRC(self, aByteArray):
-        crc = int('FFFF', 16)
-        for aByte in aByteArray:
-            crc = crc ^ aByte # XOR
-            for i in range(1, 9):
-                crcShift = crc >> 1
-                if ((crc & 1) != 0):
-                    crc = crcShift ^ int('A001', 16)
-                else:
-                    crc = crcShift
-        aByteArray.extend(crc.to_bytes(2, byteorder='little'))
-        return crc
+        return CRC.appendCRC(aByteArray)
     
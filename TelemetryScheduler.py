@@ -0,0 +1,154 @@
+import heapq
+import math
+import threading
+import time
+
+'''
+Fixed rate scheduler for simulated telemetry, so CellSimulator can emit sensor
+data periodically the way the hardware does, e.g.
+
+    scheduler = TelemetryScheduler()
+    scheduler.addStream('ILC', 50.0, lambda tick: sim.setFAForceAndStatusBatch(ids, 0, forces))
+    scheduler.addStream('Inclinometer', 10.0, lambda tick: sim.setInclinometer(angles[tick]))
+    scheduler.run(60.0)
+
+Deadlines are absolute (start + tick * period on the monotonic clock) so
+timing errors never accumulate.  When a producer overruns its next deadline
+the CATCH_UP policy runs the missed ticks back to back and SKIP drops them
+and resumes at the next deadline in the future.  Lateness (jitter) and
+overrun statistics are kept per stream.  All producers run on the scheduler
+thread, so a slow producer shows up as lateness on the other streams.  A
+producer that raises is counted in errors (with lastError) and the run goes on.
+'''
+
+CATCH_UP = 'catchup'
+SKIP = 'skip'
+
+class TelemetryStream:
+
+    def __init__(self, name:str, rate:float, producer, overrunPolicy:str = SKIP):
+        if rate <= 0.0:
+            raise Exception("The rate of stream " + name + " must be greater than 0, it is currently " + str(rate))
+        if overrunPolicy != CATCH_UP and overrunPolicy != SKIP:
+            raise Exception("overrunPolicy can only be '" + CATCH_UP + "' or '" + SKIP + "', it is currently " + str(overrunPolicy))
+        self.name = name
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.producer = producer
+        self.overrunPolicy = overrunPolicy
+        self.start = 0.0
+        self.tick = 0
+        self.resetStats()
+
+    def resetStats(self):
+        self.count = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.errors = 0
+        self.lastError = None
+        self.jitterSum = 0.0
+        self.jitterSumSquares = 0.0
+        self.jitterMax = 0.0
+
+    def deadline(self):
+        return self.start + self.tick * self.period
+
+    def stats(self):
+        mean = self.jitterSum / self.count if self.count else 0.0
+        variance = self.jitterSumSquares / self.count - mean * mean if self.count else 0.0
+        return {'rate' : self.rate, 'count' : self.count, 'overruns' : self.overruns, 'skipped' : self.skipped,
+                'errors' : self.errors, 'lastError' : self.lastError, 'jitterMean' : mean, 'jitterStd' : math.sqrt(max(variance, 0.0)),
+                'jitterMax' : self.jitterMax}
+
+class TelemetryScheduler:
+
+    # Sleep until spinTime before a deadline and busy wait the rest for sub millisecond accuracy
+    def __init__(self, spinTime:float = 0.0005):
+        self.spinTime = spinTime
+        self.streams = {}
+        self._running = False
+        self._thread = None
+
+    ##########################################################################################################
+    # producer is called with the stream's tick number (0, 1, 2, ...) at rate Hz
+    def addStream(self, name:str, rate:float, producer, overrunPolicy:str = SKIP):
+        if name in self.streams:
+            raise Exception("There is already a stream named " + name)
+        stream = TelemetryStream(name, rate, producer, overrunPolicy)
+        self.streams[name] = stream
+        return stream
+
+    def removeStream(self, name:str):
+        del self.streams[name]
+
+    ##########################################################################################################
+    # Run the streams in the calling thread for duration seconds (forever if None) or until stop()
+    def run(self, duration:float = None):
+        self._running = True
+        self._run(duration)
+
+    def _run(self, duration:float):
+        try:
+            self._runStreams(duration)
+        finally:
+            self._running = False
+
+    def _runStreams(self, duration:float):
+        start = time.monotonic()
+        end = start + duration if duration is not None else math.inf
+        heap = []
+        for order, stream in enumerate(self.streams.values()):
+            stream.start = start
+            stream.tick = 0
+            heap.append((start, order, stream))
+        heapq.heapify(heap)
+        spinTime = self.spinTime
+        monotonic = time.monotonic
+        while self._running and heap:
+            deadline, order, stream = heap[0]
+            if deadline >= end:
+                break
+            delay = deadline - monotonic()
+            if delay > spinTime:
+                time.sleep(delay - spinTime)
+            while monotonic() < deadline:
+                pass
+            now = monotonic()
+            lateness = now - deadline
+            stream.jitterSum += lateness
+            stream.jitterSumSquares += lateness * lateness
+            if lateness > stream.jitterMax:
+                stream.jitterMax = lateness
+            try:
+                stream.producer(stream.tick)
+            except Exception as error:
+                stream.errors += 1
+                stream.lastError = repr(error)
+            stream.count += 1
+            stream.tick += 1
+            finished = monotonic()
+            if finished > stream.deadline():
+                stream.overruns += 1
+                if stream.overrunPolicy == SKIP:
+                    nextTick = int((finished - stream.start) / stream.period) + 1
+                    stream.skipped += nextTick - stream.tick
+                    stream.tick = nextTick
+            heapq.heapreplace(heap, (stream.deadline(), order, stream))
+
+    def start(self, duration:float = None):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(duration,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self):
+        return {name : stream.stats() for name, stream in self.streams.items()}
+
+    def resetStats(self):
+        for stream in self.streams.values():
+            stream.resetStats()
@@ -0,0 +1,239 @@
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+
+'''
+Binary capture and timed replay of the datagrams CellSimulator sends.
+
+A capture is two append only files:
+    <path>        an 8 byte header followed by one record per datagram,
+                  [monotonic ns (q), port (H), kind (H), length (I)] little endian and the payload
+    <path>.idx    fixed size (monotonic ns, record offset) entries, one every indexInterval records
+Both are read through mmap.  The index is sorted by time, so TrafficLog.seek
+bisects it and scans at most indexInterval records, and replay can start
+anywhere in a capture of any size.
+
+    sim.startCapture('incident.cap')
+    ...
+    sim.stopCapture()
+    TrafficReplayer(TrafficLog('incident.cap'), '10.0.0.10', speed=1.0).run()
+'''
+
+MAGIC = b'M1M3CAP1'
+RECORD_HEADER = struct.Struct('<qHHI')
+INDEX_DTYPE = np.dtype([('timestamp', '<i8'), ('offset', '<u8')])
+INDEX_ENTRY = struct.Struct('<qQ')
+
+# Stream kinds, stored by their index
+UNKNOWN = 0
+KINDS = ('Unknown', 'Subnet A', 'Subnet B', 'Subnet C', 'Subnet D', 'Subnet E',
+         'Inclinometer', 'Displacement', 'Accelerometer', 'DI', 'DO')
+
+CaptureRecord = namedtuple('CaptureRecord', 'timestamp port kind payload')
+
+def kindForName(name:str):
+    if name not in KINDS:
+        raise Exception("Unknown stream kind " + str(name) + ", it can only be one of " + ", ".join(KINDS))
+    return KINDS.index(name)
+
+class TrafficRecorder:
+    '''
+    Appends datagrams to a capture.  record() is called by UDP.send and UDP.flush on every
+    client whose recorder attribute is set, it is thread safe.
+    '''
+
+    def __init__(self, path:str, indexInterval:int = 64, bufferSize:int = 1 << 20):
+        if indexInterval <= 0:
+            raise Exception("indexInterval must be greater than 0, it is currently " + str(indexInterval))
+        self.path = path
+        self.indexInterval = indexInterval
+        self.records = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb', buffering=bufferSize)
+        self._index = open(path + '.idx', 'wb', buffering=bufferSize)
+        self._file.write(MAGIC)
+        self._offset = len(MAGIC)
+
+    ##########################################################################################################
+    # Append one datagram, timestamped now unless timestamp (monotonic ns) is given.  The time is taken
+    # under the lock so records of concurrent senders are written in time order.
+    def record(self, port:int, kind:int, payload, timestamp:int = None):
+        length = len(payload)
+        with self._lock:
+            if timestamp is None:
+                timestamp = time.monotonic_ns()
+            if self.records % self.indexInterval == 0:
+                self._index.write(INDEX_ENTRY.pack(timestamp, self._offset))
+            self._file.write(RECORD_HEADER.pack(timestamp, port, kind, length))
+            self._file.write(payload)
+            self._offset += RECORD_HEADER.size + length
+            self.records += 1
+            self.bytes += length
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+            self._index.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._index.close()
+#end class TrafficRecorder
+
+class TrafficLog:
+    '''
+    Read only, memory mapped view of a capture.  Payloads are memoryviews into the map,
+    copy them if they have to outlive the TrafficLog.
+    '''
+
+    def __init__(self, path:str):
+        self.path = path
+        with open(path, 'rb') as captureFile:
+            self._map = mmap.mmap(captureFile.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise Exception(path + " is not a capture file")
+        self._view = memoryview(self._map)
+        indexPath = path + '.idx'
+        if os.path.exists(indexPath) and os.path.getsize(indexPath) >= INDEX_DTYPE.itemsize:
+            self.index = np.memmap(indexPath, dtype=INDEX_DTYPE, mode='r',
+                                   shape=(os.path.getsize(indexPath) // INDEX_DTYPE.itemsize,))
+        else:
+            # no index (the capture was not closed), fall back to one built by a scan
+            self.index = self.buildIndex()
+        self._timestamps = self.index['timestamp']
+
+    def buildIndex(self, indexInterval:int = 64):
+        entries = [(timestamp, offset) for i, (offset, timestamp) in enumerate(self._offsets()) if i % indexInterval == 0]
+        return np.array(entries, dtype=INDEX_DTYPE)
+
+    def _offsets(self):
+        offset = len(MAGIC)
+        end = len(self._map)
+        while offset + RECORD_HEADER.size <= end:
+            timestamp, port, kind, length = RECORD_HEADER.unpack_from(self._map, offset)
+            yield offset, timestamp
+            offset += RECORD_HEADER.size + length
+
+    ##########################################################################################################
+    # Offset of the first record at or after timestamp (monotonic ns)
+    def seek(self, timestamp:int):
+        entry = int(np.searchsorted(self._timestamps, timestamp, side='right')) - 1
+        offset = int(self.index['offset'][entry]) if entry >= 0 else len(MAGIC)
+        end = len(self._map)
+        while offset + RECORD_HEADER.size <= end:
+            recordTime = RECORD_HEADER.unpack_from(self._map, offset)[0]
+            if recordTime >= timestamp:
+                break
+            offset += RECORD_HEADER.size + RECORD_HEADER.unpack_from(self._map, offset)[3]
+        return offset
+
+    ##########################################################################################################
+    # Records from start up to (not including) end, both monotonic ns, the whole capture by default
+    def records(self, start:int = None, end:int = None):
+        offset = self.seek(start) if start is not None else len(MAGIC)
+        view = self._view
+        unpack = RECORD_HEADER.unpack_from
+        headerSize = RECORD_HEADER.size
+        size = len(self._map)
+        while offset + headerSize <= size:
+            timestamp, port, kind, length = unpack(self._map, offset)
+            if end is not None and timestamp >= end:
+                break
+            payloadOffset = offset + headerSize
+            if payloadOffset + length > size:
+                # truncated last record
+                break
+            yield CaptureRecord(timestamp, port, kind, view[payloadOffset : payloadOffset + length])
+            offset = payloadOffset + length
+
+    def startTime(self):
+        for record in self.records():
+            return record.timestamp
+        return None
+
+    def endTime(self):
+        last = None
+        start = int(self._timestamps[-1]) if len(self._timestamps) else None
+        for record in self.records(start):
+            last = record.timestamp
+        return last
+
+    # Every payload memoryview handed out must be released first
+    def close(self):
+        self._view.release()
+        self.index = None
+        self._timestamps = None
+        self._map.close()
+#end class TrafficLog
+
+class TrafficReplayer:
+    '''
+    Resends a capture to ipAddress on the recorded ports (shifted by portOffset), keeping the
+    recorded spacing divided by speed.  speed = None sends as fast as possible.  Deadlines are
+    absolute so timing errors do not accumulate over long replays.
+    '''
+
+    def __init__(self, log:TrafficLog, ipAddress:str, speed:float = 1.0, portOffset:int = 0, spinTime:float = 0.0005):
+        if speed is not None and speed <= 0.0:
+            raise Exception("speed must be greater than 0 or None, it is currently " + str(speed))
+        self.log = log
+        self.ipAddress = ipAddress
+        self.speed = speed
+        self.portOffset = portOffset
+        self.spinTime = spinTime
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.resetStats()
+
+    def resetStats(self):
+        self.datagramsSent = 0
+        self.bytesSent = 0
+        self.latenessMax = 0.0
+        self.latenessSum = 0.0
+
+    ##########################################################################################################
+    # Replay the records between start and end (monotonic ns of the capture), returns the elapsed seconds
+    def run(self, start:int = None, end:int = None, kinds = None):
+        sendto = self.sock.sendto
+        ipAddress = self.ipAddress
+        portOffset = self.portOffset
+        speed = self.speed
+        spinTime = self.spinTime
+        monotonic = time.monotonic
+        replayStart = monotonic()
+        firstTimestamp = None
+        for record in self.log.records(start, end):
+            if kinds is not None and record.kind not in kinds:
+                continue
+            if speed is not None:
+                if firstTimestamp is None:
+                    firstTimestamp = record.timestamp
+                deadline = replayStart + (record.timestamp - firstTimestamp) * 1e-9 / speed
+                delay = deadline - monotonic()
+                if delay > spinTime:
+                    time.sleep(delay - spinTime)
+                while monotonic() < deadline:
+                    pass
+                lateness = monotonic() - deadline
+                self.latenessSum += lateness
+                if lateness > self.latenessMax:
+                    self.latenessMax = lateness
+            sendto(record.payload, (ipAddress, record.port + portOffset))
+            self.datagramsSent += 1
+            self.bytesSent += len(record.payload)
+        return monotonic() - replayStart
+
+    def stats(self):
+        return {'datagramsSent' : self.datagramsSent, 'bytesSent' : self.bytesSent, 'latenessMax' : self.latenessMax,
+                'latenessMean' : self.latenessSum / self.datagramsSent if self.datagramsSent else 0.0}
+
+    def close(self):
+        self.sock.close()
+#end class TrafficReplayer
@@ -1,6 +1,9 @@
 import socket
 import sys
-import _thread
+import time
+import queue
+import threading
+import traceback
 
 ''' 
 UDP
@@ -8,8 +11,20 @@ AWCLEMENTS 28 August 2017
 
 UDP message must fit within 65,507 bytes as messages
 must fit in a single packet
+
+With batching enabled frames are queued and sent as coalesced datagrams.
+Every frame already starts with its own length byte so the receiver can split
+a datagram back into frames.
 '''
 
+MAX_DATAGRAM_SIZE = 65507
+# sendmsg accepts at most IOV_MAX buffers per datagram
+MAX_FRAMES_PER_DATAGRAM = 1024
+
+# UDPReceiver policies when its queue is full
+DROP = 'drop'
+BLOCK = 'block'
+
 class UDP:
     def __init__(self, ip_address, port_number, bind = False):
         self.UDP_IP = ip_address
@@ -28,45 +43,300 @@ class UDP:
             print ('Failed to create socket. Error Code : ' + str(msg[0]) + ' Message ' + msg[1])
             sys.exit()
     
+        self.server_address = (self.UDP_IP, self.UDP_PORT)
+        self.framesSent = 0
+        self.datagramsSent = 0
+        self.bytesSent = 0
+        self._batching = False
+        self._queue = []
+        self._queuedBytes = 0
+        self._queueStart = 0.0
+        self._maxDatagramSize = MAX_DATAGRAM_SIZE
+        self._maxDelay = None
+        # guards the queue, the flusher thread sends batches older than maxDelay
+        self._condition = threading.Condition(threading.RLock())
+        self._flusher = None
+        self._useSendmsg = hasattr(self.sock, 'sendmsg')
+        # TrafficCapture.TrafficRecorder, every datagram sent is recorded with captureKind when set
+        self.recorder = None
+        self.captureKind = 0
+    
     def send(self, message):
-        try:  message
-        except NameError: message = 'Hello World.'
+        if isinstance(message, str):
+            message = message.encode() # need encode in Python 3
+        if self._batching:
+            self.queue(message)
+            return
+        self.sock.sendto(message, self.server_address)
+        if self.recorder is not None:
+            self.recorder.record(self.UDP_PORT, self.captureKind, message)
+        self.framesSent += 1
+        self.datagramsSent += 1
+        self.bytesSent += len(message)
+
+    ##########################################################################################################
+    # Batching, frames passed to send are queued until flush is called, the next frame would
+    # not fit in maxDatagramSize or the oldest queued frame is older than maxDelay seconds.
+    # With maxDelay a flusher thread sends the batch once it is due, even when nothing else is sent.
+    # Queued frames are sent as they are at flush time, so do not modify a frame after sending it.
+    def enableBatching(self, maxDatagramSize:int = MAX_DATAGRAM_SIZE, maxDelay:float = None, useSendmsg:bool = True):
+        if maxDatagramSize > MAX_DATAGRAM_SIZE:
+            raise Exception("maxDatagramSize can only be a maximum of " + str(MAX_DATAGRAM_SIZE))
+        self._stopFlusher()
+        self._maxDatagramSize = maxDatagramSize
+        self._maxDelay = maxDelay
+        self._useSendmsg = useSendmsg and hasattr(self.sock, 'sendmsg')
+        self._batching = True
+        if maxDelay is not None:
+            self._flusher = threading.Thread(target=self._flushDue, daemon=True)
+            self._flusher.start()
+
+    def disableBatching(self):
+        self._stopFlusher()
+        self.flush()
+        self._batching = False
+
+    def _stopFlusher(self):
+        if self._flusher is not None:
+            with self._condition:
+                flusher = self._flusher
+                self._flusher = None
+                self._condition.notify_all()
+            flusher.join()
 
-        server_address = (self.UDP_IP, self.UDP_PORT)
-        if (isinstance(message, bytearray)):
-            self.sock.sendto(message, server_address) # need encode in Python 3
+    # Flusher thread, sends the queued frames once the oldest is maxDelay seconds old
+    def _flushDue(self):
+        current = threading.current_thread()
+        with self._condition:
+            while self._flusher is current:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+                remaining = self._queueStart + self._maxDelay - time.monotonic()
+                if remaining > 0.0:
+                    self._condition.wait(remaining)
+                else:
+                    self.flush()
+
+    def queue(self, frame):
+        frameLength = len(frame)
+        if frameLength > self._maxDatagramSize:
+            raise Exception("Frame is too large: " + str(frameLength)
+                            + ", it can only be a maximum of " + str(self._maxDatagramSize))
+        with self._condition:
+            if self._queuedBytes + frameLength > self._maxDatagramSize or len(self._queue) >= MAX_FRAMES_PER_DATAGRAM:
+                self.flush()
+            if not self._queue:
+                self._queueStart = time.monotonic()
+                if self._flusher is not None:
+                    self._condition.notify()
+            self._queue.append(frame)
+            self._queuedBytes += frameLength
+            if self._maxDelay is not None and time.monotonic() - self._queueStart >= self._maxDelay:
+                self.flush()
+
+    def flush(self):
+        with self._condition:
+            self._flushLocked()
+
+    def _flushLocked(self):
+        if not self._queue:
+            return
+        if self._useSendmsg:
+            # scatter-gather, the frames are not copied into one buffer
+            self.sock.sendmsg(self._queue, (), 0, self.server_address)
         else:
-            self.sock.sendto(message.encode(), server_address) # need encode in Python 3
+            self.sock.sendto(b''.join(self._queue), self.server_address)
+        if self.recorder is not None:
+            self.recorder.record(self.UDP_PORT, self.captureKind, b''.join(self._queue))
+        self.framesSent += len(self._queue)
+        self.datagramsSent += 1
+        self.bytesSent += self._queuedBytes
+        self._queue = []
+        self._queuedBytes = 0
+
+    ##########################################################################################################
+    # Send a group of frames now as coalesced datagrams, regardless of the batching mode
+    def sendFrames(self, frames):
+        with self._condition:
+            for frame in frames:
+                self.queue(frame)
+            self.flush()
+
+    def resetCounters(self):
+        self.framesSent = 0
+        self.datagramsSent = 0
+        self.bytesSent = 0
             
     def get(self):
         data, addr = self.sock.recvfrom(1024)
         return data
 
-    def receive(self, functionCall):
-        try:
-            self.sock.bind((self.UDP_IP, self.UDP_PORT))
-        except socket.error as msg:
-            print('Bind failed. Error Code : ' + str(msg[0]) + ' Message ' + msg[1])
-            sys.exit()
-            
-        while True:
-            data, addr = self.sock.recvfrom(1024) # buffer size is 1024 bytes
-            #print ("received message: ", data)
-            if (len(data) > 0):
-                _thread.start_new_thread(functionCall, (data.decode(),)) # the comma is there to diambiguate about being a tuple
-            #break
+    ##########################################################################################################
+    # Receive datagrams forever and hand each one to functionCall on a pool of worker threads.
+    # See UDPReceiver for the parameters, binary = False decodes the payloads to str as before.
+    def receive(self, functionCall, workers:int = 4, queueSize:int = 1024, policy:str = DROP, binary:bool = False):
+        self.receiver = UDPReceiver(self, functionCall, workers, queueSize, policy, binary)
+        self.receiver.run()
+
+    # True when the socket is bound to UDP_PORT, a socket that has sent is bound to an ephemeral port instead
+    def bound(self):
+        return self.sock.getsockname()[1] == self.UDP_PORT
 #end class UDP
 
+class UDPReceiver:
+    '''
+    Receive engine feeding a fixed number of worker threads through a bounded queue.
+    When the queue is full policy DROP discards the datagram (counted in dropped) and
+    BLOCK stops reading until a worker frees a slot, leaving the backlog in the socket buffer.
+    Datagrams of up to MAX_DATAGRAM_SIZE bytes are delivered as bytes, or as str if binary is False.
+    '''
+
+    def __init__(self, udp:UDP, functionCall, workers:int = 4, queueSize:int = 1024, policy:str = DROP, binary:bool = True):
+        if policy != DROP and policy != BLOCK:
+            raise Exception("policy can only be '" + DROP + "' or '" + BLOCK + "', it is currently " + str(policy))
+        self.udp = udp
+        self.functionCall = functionCall
+        self.workers = workers
+        self.policy = policy
+        self.binary = binary
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.errors = 0
+        self.queueHighWater = 0
+        self._queue = queue.Queue(queueSize)
+        self._countLock = threading.Lock()
+        self._running = False
+        self._threads = []
+        # thread of the read loop, stop() waits for it before stopping the workers
+        self._reader = None
+
+    def start(self):
+        if not self.udp.bound():
+            try:
+                self.udp.sock.bind((self.udp.UDP_IP, self.udp.UDP_PORT))
+            except socket.error as msg:
+                print('Bind failed. Error Code : ' + str(msg.errno) + ' Message ' + msg.strerror)
+                sys.exit()
+        if self.udp.sock.gettimeout() is None:
+            # lets the read loop notice stop()
+            self.udp.sock.settimeout(1)
+        self._running = True
+        self._threads = [threading.Thread(target=self._work, daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    ##########################################################################################################
+    # Read loop, runs in the calling thread until stop() is called
+    def run(self):
+        if not self._running:
+            self.start()
+        self._reader = threading.current_thread()
+        sock = self.udp.sock
+        put = self._queue.put
+        putNowait = self._queue.put_nowait
+        qsize = self._queue.qsize
+        block = self.policy == BLOCK
+        while self._running:
+            try:
+                data = sock.recv(MAX_DATAGRAM_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self._running:
+                    break
+                raise
+            if len(data) == 0:
+                continue
+            self.received += 1
+            if not self.binary:
+                data = data.decode()
+            if block:
+                put(data)
+            else:
+                try:
+                    putNowait(data)
+                except queue.Full:
+                    self.dropped += 1
+                    continue
+            depth = qsize()
+            if depth > self.queueHighWater:
+                self.queueHighWater = depth
+
+    def runInBackground(self):
+        self.start()
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        return thread
+
+    # Stop reading first, so nothing is queued after the worker sentinels, then let the workers finish the queue
+    def stop(self):
+        self._running = False
+        reader = self._reader
+        if reader is not None and reader is not threading.current_thread():
+            reader.join()
+        self._reader = None
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _work(self):
+        get = self._queue.get
+        functionCall = self.functionCall
+        while True:
+            data = get()
+            if data is None:
+                return
+            try:
+                functionCall(data)
+            except Exception:
+                with self._countLock:
+                    self.errors += 1
+                traceback.print_exc()
+            with self._countLock:
+                self.processed += 1
+
+    def counters(self):
+        return {'received' : self.received, 'dropped' : self.dropped, 'processed' : self.processed,
+                'errors' : self.errors, 'queueHighWater' : self.queueHighWater}
+
+#end class UDPReceiver
+
+# Frames per second sent to ipAddress:port with batching off and on
+def measureThroughput(ipAddress, port, frame, count:int = 100000):
+    results = {}
+    for batching in (False, True):
+        udpInstance = UDP(ipAddress, port)
+        if batching:
+            udpInstance.enableBatching()
+        start = time.perf_counter()
+        for i in range(count):
+            udpInstance.send(frame)
+        udpInstance.flush()
+        elapsed = time.perf_counter() - start
+        results[batching] = count / elapsed
+        print("Batching %s: %d frames in %d datagrams, %0.0f frames/s" % (
+            "on" if batching else "off", udpInstance.framesSent, udpInstance.datagramsSent, results[batching]))
+        udpInstance.sock.close()
+    return results
+
 # main(): for quick command line testing
 def main():
     if (len(sys.argv) < 2 or
-            (sys.argv[1] != "-client" and sys.argv[1] != "-server")):
-        print ("Usage: UDP [-client|-server] <message>")
+            (sys.argv[1] != "-client" and sys.argv[1] != "-server" and sys.argv[1] != "-throughput")):
+        print ("Usage: UDP [-client|-server|-throughput] <message>")
         sys.exit(0)
 
+    if (sys.argv[1] == "-throughput"):
+        measureThroughput("127.0.0.1", 5005, bytes([12, 17, 76, 9, 0, 63, 192, 0, 0, 192, 16, 0, 0]))
+        return
+
     udpInstance = UDP("127.0.0.1", 5005)
     if (sys.argv[1] == "-server"):
-        udpInstance.receive()
+        udpInstance.receive(print)
 
     if (sys.argv[1] == "-client"):
         udpInstance.send(sys.argv[2])
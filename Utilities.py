@@ -1,5 +1,6 @@
 import time
-import datetime
+import threading
+import Logger
 
 def Equal(topic, actual, expected):
     message = "Check %s (%s) = %s" % (topic, GetFormat(actual), GetFormat(expected))
@@ -29,33 +30,102 @@ def InRange(topic, actual, min, max):
     message = "Check %s (%s) in [%s, %s]" % (topic, GetFormat(actual), GetFormat(min), GetFormat(max))
     return Result(message, actual >= min and actual <= max)
     
-def WaitUntil(topic, timeout, eval):
-    start = time.time()
-    timedout = False
-    while not eval():
-        time.sleep(0.1)
-        if time.time() - start >= timeout:
-           timedout = True
-           break
-    message = "WaitUntil %s or %0.3fs" % (topic, timeout)
-    return Result(message, not timedout)
+def WaitUntil(topic, timeout, eval, notifier = None):
+    satisfied, elapsed = WaitFor(timeout, eval, notifier)
+    message = "WaitUntil %s or %0.3fs (waited %0.4fs)" % (topic, timeout, elapsed)
+    return Result(message, satisfied)
+
+# Polling backoff of WaitFor, the interval doubles from the first to the last
+WaitPollFirst = 0.001
+WaitPollLast = 0.1
+
+# Wait until eval() is true or timeout seconds passed, returns (eval() was true, seconds waited).
+# With a Notifier eval() is checked whenever a producer notifies, otherwise it is polled with a
+# backoff from WaitPollFirst to WaitPollLast.  The backoff also runs with a notifier, in case
+# the condition changes without a notification.
+def WaitFor(timeout, eval, notifier = None):
+    start = time.monotonic()
+    deadline = start + timeout
+    interval = WaitPollFirst
+    while True:
+        if notifier is not None:
+            version = notifier.version
+        if eval():
+            return True, time.monotonic() - start
+        remaining = deadline - time.monotonic()
+        if remaining <= 0.0:
+            return False, time.monotonic() - start
+        if notifier is not None:
+            notifier.wait(version, min(interval, remaining))
+        else:
+            time.sleep(min(interval, remaining))
+        interval = min(interval * 2.0, WaitPollLast)
+
+class Notifier:
+    '''
+    Lets producers (the DO listener, SAL event polling, simulator state) wake WaitFor/WaitUntil
+    directly.  notify() is a counter increment when nobody is waiting.
+    '''
+
+    def __init__(self):
+        self.version = 0
+        self._waiters = 0
+        self._condition = threading.Condition()
+
+    def notify(self):
+        self.version += 1
+        if self._waiters:
+            with self._condition:
+                self._condition.notify_all()
+
+    # Wait until the version moves past version or timeout seconds, returns True if it moved
+    def wait(self, version, timeout):
+        with self._condition:
+            self._waiters += 1
+            try:
+                if self.version == version:
+                    self._condition.wait(timeout)
+            finally:
+                self._waiters -= 1
+        return self.version != version
 
 def InTolerance(topic, actual, expected, tolerance):
     message = "Check %s (%s) = %s (+/-)%s" % (topic, GetFormat(actual), GetFormat(expected), GetFormat(tolerance))
     return Result(message, actual >= (expected - tolerance) and actual <= (expected + tolerance))        
     
-def Log(message):
-    _Log("     - %s" % message)
+# Records are buffered and written by the logger's flusher, WARNING and above and whatever is left at exit are
+# written immediately, see Logger.  Scripts that interleave print() with the log call SetLogSynchronous(True).
+logger = Logger.Logger()
 
-def _Log(message):
-    timestamp = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%dT%H:%M:%S')
-    print("%s: %s" % (timestamp, message))
+def Log(message, *args):
+    logger.log(Logger.INFO, "     - " + message, *args)
+
+def _Log(message, *args):
+    logger.log(Logger.INFO, message, *args)
+
+def SetLogLevel(level):
+    logger.level = level
+
+def SetLogSynchronous(synchronous):
+    logger.synchronous = synchronous
+    if synchronous:
+        logger.flush()
+
+def AddLogSink(sink):
+    logger.sinks.append(sink)
+
+def FlushLog():
+    logger.flush()
     
+# Number of PASS and ANOM results in this process, ScenarioRunner reads them per scenario
+ResultCounts = {"PASS" : 0, "ANOM" : 0}
+
 def Result(message, result):
     text = "ANOM"
     if result:
         text = "PASS"
-    _Log("%s - %s" % (text, message))
+    ResultCounts[text] += 1
+    _Log("%s - %s", text, message)
     return result
     
 def GetFormat(value):
@@ -1,6 +1,9 @@
 from Utilities import *
 
 class VerifyStateChanges:
+    # drives the one M1M3 behind SAL, see ScenarioRunner
+    parallel = False
+
     def run(self, m1m3, sim):
         m1m3.Start("Default")
         result, data = m1m3.GetEventDetailedState()